@@ -0,0 +1,157 @@
+"""
+Decoding of the columnar member batches sent by the relay server.
+
+A batch is a msgpack map with one list per member field, optionally compressed with
+zstd (Content-Encoding: zstd). Requests with any other content type are JSON.
+"""
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+try:
+    import msgpack
+except ModuleNotFoundError:
+    msgpack = None
+
+try:
+    import zstandard
+except ModuleNotFoundError:
+    zstandard = None
+
+
+MEMBER_BATCH_CONTENT_TYPE = "application/vnd.howblox.member-batch+msgpack"
+MEMBER_BATCH_VERSION = 1
+# Upper bound on a decompressed batch, well above the largest verifyall chunk.
+MAX_MEMBER_BATCH_SIZE = 64 * 1024 * 1024
+DECOMPRESS_READ_SIZE = 64 * 1024
+
+
+def accepts_member_batches(content_encoding: str | None = None) -> bool:
+    """
+    Whether a columnar batch with the given content encoding can be decoded here.
+    Requests that cannot be decoded should be answered with 415 so the relay falls
+    back to JSON.
+    """
+
+    if msgpack is None:
+        return False
+
+    if content_encoding == "zstd":
+        return zstandard is not None
+
+    return content_encoding in (None, "", "identity")
+
+
+@dataclass(slots=True)
+class MemberBatch:
+    """
+    A decoded batch of members, kept in columns. Iterating it yields one dict per
+    member in the shape of MemberSerializable.model_dump().
+    """
+
+    guild_id: int
+    nonce: str | None
+    columns: dict[str, list[Any]]
+    count: int
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        fields = tuple(self.columns)
+
+        for values in zip(*self.columns.values()):
+            yield dict(zip(fields, values))
+
+
+def decompress_member_batch(body: bytes, max_size: int) -> bytes:
+    """
+    Decompresses a zstd member batch, refusing to inflate it past max_size bytes.
+    The frame's declared content size is not trusted.
+    """
+
+    chunks: list[bytes] = []
+    size = 0
+
+    try:
+        with zstandard.ZstdDecompressor().stream_reader(body) as reader:
+            while chunk := reader.read(DECOMPRESS_READ_SIZE):
+                size += len(chunk)
+
+                if size > max_size:
+                    raise ValueError(
+                        f"Member batch inflates past {max_size} bytes."
+                    )
+
+                chunks.append(chunk)
+    except zstandard.ZstdError as ex:
+        raise ValueError("Invalid zstd member batch.") from ex
+
+    return b"".join(chunks)
+
+
+def decode_member_batch(
+    body: bytes,
+    content_encoding: str | None = None,
+    *,
+    max_size: int = MAX_MEMBER_BATCH_SIZE,
+) -> MemberBatch:
+    """
+    Decodes a columnar member batch.
+    Raises ValueError if the body is not a valid batch.
+    """
+
+    if not accepts_member_batches(content_encoding):
+        raise ValueError(
+            f"Member batches with content encoding {content_encoding!r} "
+            "are not supported."
+        )
+
+    if content_encoding == "zstd":
+        body = decompress_member_batch(body, max_size)
+
+    try:
+        batch = msgpack.unpackb(body)
+    except (msgpack.UnpackException, ValueError) as ex:
+        raise ValueError("Invalid msgpack member batch.") from ex
+
+    if not isinstance(batch, dict) or batch.get("version") != MEMBER_BATCH_VERSION:
+        raise ValueError("Unsupported member batch version.")
+
+    guild_id = batch.get("guild_id")
+    nonce = batch.get("nonce")
+    columns = batch.get("columns")
+    count = batch.get("count")
+    snowflake_lists = batch.get("snowflake_lists", [])
+
+    if not isinstance(guild_id, int) or isinstance(guild_id, bool):
+        raise ValueError("Member batch guild_id must be an integer.")
+
+    if nonce is not None and not isinstance(nonce, str):
+        raise ValueError("Member batch nonce must be a string.")
+
+    if not isinstance(count, int) or isinstance(count, bool) or count < 0:
+        raise ValueError("Member batch count must be a non-negative integer.")
+
+    if not isinstance(columns, dict) or not all(
+        isinstance(field, str) and isinstance(values, list)
+        for field, values in columns.items()
+    ):
+        raise ValueError("Member batch columns must map field names to lists.")
+
+    if any(len(values) != count for values in columns.values()):
+        raise ValueError("Member batch columns do not match the member count.")
+
+    if not isinstance(snowflake_lists, list) or any(
+        field not in columns for field in snowflake_lists
+    ):
+        raise ValueError("Member batch snowflake_lists must name columns.")
+
+    for field in snowflake_lists:
+        values = columns[field]
+
+        if not all(isinstance(value, list) for value in values):
+            raise ValueError(f"Member batch column {field!r} must hold lists.")
+
+        columns[field] = [[str(item) for item in value] for value in values]
+
+    return MemberBatch(guild_id=guild_id, nonce=nonce, columns=columns, count=count)
@@ -0,0 +1,99 @@
+import json
+import unittest
+from pathlib import Path
+
+import msgpack
+import zstandard
+
+from domain.members import decode_member_batch
+
+# Batches encoded by the relay server's member_codec.encode_member_batch from the
+# members in member_batch.json, uncompressed and with zstd.
+FIXTURES = Path(__file__).parent / "fixtures"
+EXPECTED = json.loads((FIXTURES / "member_batch.json").read_text(encoding="utf-8"))
+
+
+class MemberBatchFixtureTests(unittest.TestCase):
+    """Batches encoded by the relay decode to the members they were built from."""
+
+    def test_compressed_batch(self):
+        body = (FIXTURES / "member_batch.msgpack.zst").read_bytes()
+        batch = decode_member_batch(body, "zstd")
+
+        self.assertEqual((batch.guild_id, batch.nonce, len(batch)), (1, "nonce", 2))
+        self.assertEqual(list(batch), EXPECTED["members"])
+
+    def test_uncompressed_batch(self):
+        body = (FIXTURES / "member_batch.msgpack").read_bytes()
+
+        self.assertEqual(list(decode_member_batch(body)), EXPECTED["members"])
+
+    def test_snowflake_lists_are_packed_as_integers(self):
+        packed = msgpack.unpackb((FIXTURES / "member_batch.msgpack").read_bytes())
+
+        self.assertEqual(packed["snowflake_lists"], ["roles"])
+        self.assertEqual(
+            packed["columns"]["roles"][0], [1052311264406818816, 1052311264406818817]
+        )
+        self.assertEqual(packed["columns"]["tags"], [["007"], ["1"]])
+
+
+class DecodeMemberBatchTests(unittest.TestCase):
+    """Invalid batches are rejected with ValueError."""
+
+    @staticmethod
+    def pack(**overrides) -> bytes:
+        batch = {
+            "version": 1,
+            "guild_id": 1,
+            "nonce": None,
+            "count": 1,
+            "columns": {"id": ["1"]},
+            "snowflake_lists": [],
+        }
+
+        return msgpack.packb(batch | overrides)
+
+    def test_valid_batch(self):
+        self.assertEqual(list(decode_member_batch(self.pack())), [{"id": "1"}])
+
+    def test_empty_batch(self):
+        batch = decode_member_batch(self.pack(count=0, columns={}))
+
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(list(batch), [])
+
+    def test_rejects_invalid_batches(self):
+        bodies = {
+            "not msgpack": b"\xc1",
+            "not a map": msgpack.packb([1, 2]),
+            "wrong version": self.pack(version=2),
+            "guild_id": self.pack(guild_id="1"),
+            "nonce": self.pack(nonce=1),
+            "count": self.pack(count=-1),
+            "columns": self.pack(columns={"id": "1"}),
+            "column length": self.pack(count=2),
+            "snowflake_lists": self.pack(snowflake_lists=["roles"]),
+            "snowflake values": self.pack(snowflake_lists=["id"]),
+        }
+
+        for case, body in bodies.items():
+            with self.subTest(case), self.assertRaises(ValueError):
+                decode_member_batch(body)
+
+    def test_rejects_unsupported_encoding(self):
+        with self.assertRaises(ValueError):
+            decode_member_batch(self.pack(), "gzip")
+
+    def test_rejects_invalid_zstd(self):
+        with self.assertRaises(ValueError):
+            decode_member_batch(b"not zstd", "zstd")
+
+    def test_caps_decompressed_size(self):
+        ids = [str(member_id) for member_id in range(10_000)]
+        body = zstandard.ZstdCompressor().compress(
+            self.pack(count=len(ids), columns={"id": ids})
+        )
+
+        with self.assertRaises(ValueError):
+            decode_member_batch(body, "zstd", max_size=1024)
@@ -1,6 +1,7 @@
 import asyncio
 from howblox_lib import load_modules
 from app.howblox import howblox
+from app.bot_api import bot_api
 from app.config import CONFIG
 
 
@@ -17,8 +18,11 @@ async def main():
     except FileNotFoundError: 
         load_modules(*MODULES, starting_path="./relay-server/")
 
-    async with howblox as bot:
-        await bot.start(CONFIG.DISCORD_TOKEN)
+    try:
+        async with howblox as bot:
+            await bot.start(CONFIG.DISCORD_TOKEN)
+    finally:
+        await bot_api.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,131 @@
+"""
+Admission control for relay requests: deadlines, per-endpoint queue bounds and priority.
+
+During a backlog the relay would otherwise run every queued request, including ones whose
+callers gave up long ago. Expired requests are dropped before they run, full endpoint
+queues shed new requests straight away, and the node-wide handler slots go to the most
+urgent endpoints first, so cheap lookups stay fast while bulk jobs queue up.
+
+Deadlines are first checked on arrival from the envelope fields alone, so requests that
+already expired in a backlog are dropped without decoding their payloads.
+"""
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from .base import RelayEndpoint, RelayEnvelope, RelayEnvelopeHeader
+from .config import CONFIG
+from .metrics import RELAY_REQUESTS
+
+
+def request_deadline(envelope: RelayEnvelopeHeader) -> float | None:
+    """Returns when a request expires, as a unix timestamp, or None if it never does."""
+
+    if deadline := envelope.get("deadline"):
+        return deadline
+
+    if (sent_at := envelope.get("sent_at")) and CONFIG.RELAY_REQUEST_MAX_AGE:
+        return sent_at + CONFIG.RELAY_REQUEST_MAX_AGE
+
+    return None
+
+
+def request_expired(envelope: RelayEnvelopeHeader, now: float | None = None) -> bool:
+    """Whether the caller of a request has stopped waiting for it."""
+
+    deadline = request_deadline(envelope)
+
+    return deadline is not None and (now or time.time()) >= deadline
+
+
+def decode_request(endpoint: RelayEndpoint, raw_message: str | bytes) -> RelayEnvelope | None:
+    """Decodes a raw request frame, or returns None if its caller already gave up on it.
+
+    Raises ValueError if the frame is malformed.
+    """
+
+    if request_expired(endpoint.decode_header(raw_message)):
+        RELAY_REQUESTS.inc(str(endpoint.path), "expired")
+        return None
+
+    return endpoint.decode(raw_message)
+
+
+@asynccontextmanager
+async def admit(endpoint: RelayEndpoint, envelope: RelayEnvelope) -> AsyncIterator[bool]:
+    """Queues a request for one of its endpoint's handlers and a handler slot, holding both for the block.
+
+    Yields whether the request is still wanted once it leaves the queue.
+    """
+
+    endpoint.queued += 1
+    queued = True
+
+    try:
+        async with endpoint.semaphore, handler_slots.slot(endpoint.priority):
+            endpoint.queued -= 1
+            queued = False
+
+            yield not request_expired(envelope)
+    finally:
+        if queued:
+            endpoint.queued -= 1
+
+
+class PrioritySlots:
+    """A semaphore that hands freed slots to the waiter with the most urgent priority.
+
+    Waiters of the same priority are served in arrival order.
+    """
+
+    def __init__(self, slots: int):
+        self.available = slots
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    @asynccontextmanager
+    async def slot(self, priority: int) -> AsyncIterator[None]:
+        """Holds a slot for the duration of the block."""
+
+        await self.acquire(priority)
+
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, priority: int):
+        """Waits for a slot."""
+
+        if self.available > 0 and not self._waiters:
+            self.available -= 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), waiter))
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before the cancellation landed.
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+
+            raise
+
+    def release(self):
+        """Gives a slot back, handing it to the most urgent waiter."""
+
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+        self.available += 1
+
+
+handler_slots = PrioritySlots(CONFIG.RELAY_MAX_IN_FLIGHT)
@@ -1,9 +1,18 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Optional, Generic, TypeVar
+from enum import IntEnum
+from functools import cache
+from types import MappingProxyType
+from typing import Iterable, Optional, Generic, TypeVar
+from typing_extensions import NotRequired, TypedDict
+from pydantic import TypeAdapter
 from howblox_lib import load_modules, BaseModel
+from .config import CONFIG
 
 
 RELAY_ENDPOINTS: list['RelayEndpoint'] = []
+_ENDPOINT_TABLE: dict[str, 'RelayEndpoint'] = {}
+ENDPOINT_TABLE: MappingProxyType[str, 'RelayEndpoint'] = MappingProxyType(_ENDPOINT_TABLE)
 T = TypeVar("T", bound=BaseModel | dict)
 
 
@@ -60,18 +69,126 @@ class RelayRequest[T: BaseModel | dict](ABC):
         raise NotImplementedError("Respond() is not implemented.")
 
 
+class RelayEnvelopeHeader(TypedDict):
+    """The fields of a relay request envelope besides its payload."""
+
+    nonce: NotRequired[str | None]
+    # Unix timestamps. Requests past their deadline, or older than RELAY_REQUEST_MAX_AGE, are dropped.
+    sent_at: NotRequired[float | None]
+    deadline: NotRequired[float | None]
+
+
+class RelayEnvelope(RelayEnvelopeHeader, Generic[T]):
+    """The JSON body of a relay request, as published by callers."""
+
+    data: T
+
+
+class RequestPriority(IntEnum):
+    """Priority of an endpoint's requests for handler slots. Lower values go first."""
+
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+def shard_for_guild(guild_id: int) -> int:
+    """Returns the shard a guild is on."""
+
+    return (guild_id >> 22) % CONFIG.SHARD_COUNT
+
+
+def shard_channel(path: str | RelayPath, shard_id: int) -> str:
+    """Returns the channel of an endpoint that only the node running the shard subscribes to."""
+
+    path = path if isinstance(path, RelayPath) else RelayPath(path)
+
+    return str(RelayPath([*path, str(shard_id)]))
+
+
 class RelayEndpoint(Generic[T]):
-    def __init__(self, path: str | RelayPath, payload_model: T = None):
+    def __init__(
+        self,
+        path: str | RelayPath,
+        payload_model: T = None,
+        *,
+        max_concurrency: int = None,
+        max_queued: int = None,
+        priority: RequestPriority = RequestPriority.NORMAL,
+        sharded: bool = False,
+        coalesce: bool = False,
+    ):
         self.path = path if isinstance(path, RelayPath) else RelayPath(path)
         self.payload_model = payload_model
+        self.envelope_adapter = envelope_adapter(payload_model)
+        self.max_concurrency = (
+            CONFIG.RELAY_ENDPOINT_CONCURRENCY_LIMITS.get(str(self.path))
+            or max_concurrency
+            or CONFIG.RELAY_ENDPOINT_CONCURRENCY
+        )
+        self.max_queued = (
+            CONFIG.RELAY_ENDPOINT_QUEUE_LIMITS.get(str(self.path))
+            or max_queued
+            or CONFIG.RELAY_ENDPOINT_QUEUE_LIMIT
+        )
+        self.priority = priority
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.queued = 0
+        self.sharded = sharded
+        # Identical concurrent requests are handled once. Only for endpoints whose result
+        # depends on nothing but the payload, and which reply solely by returning it.
+        self.coalesce = coalesce
+
+    def channels(self, shard_ids: Iterable[int]) -> list[str]:
+        """Returns the channels this node listens to the endpoint on.
+
+        Sharded endpoints get a channel per shard the node runs, so requests about a guild
+        can be published to the one node holding it. The shared channel is kept while
+        RELAY_SHARED_CHANNELS is on, for callers that still broadcast.
+        """
+
+        if not self.sharded:
+            return [str(self.path)]
+
+        channels = [shard_channel(self.path, shard_id) for shard_id in shard_ids]
+
+        if CONFIG.RELAY_SHARED_CHANNELS:
+            channels.insert(0, str(self.path))
+
+        return channels
+
+    def decode(self, raw_message: str | bytes) -> RelayEnvelope[T]:
+        """Decodes a raw pubsub frame straight into an envelope holding the typed payload."""
+
+        return self.envelope_adapter.validate_json(raw_message)
+
+    @staticmethod
+    def decode_header(raw_message: str | bytes) -> RelayEnvelopeHeader:
+        """Decodes only the envelope fields of a raw frame, skipping over its payload."""
+
+        return ENVELOPE_HEADER_ADAPTER.validate_json(raw_message)
 
     @abstractmethod
     async def handle(self, request: RelayRequest[T]) -> BaseModel:
         raise NotImplementedError(f"Endpoint {self.__class__.__name__} is not implemented.")
 
 
-def discover_endpoints():
-    """Discovers all endpoints in the endpoints directory."""
+@cache
+def envelope_adapter(payload_model: type | None) -> TypeAdapter:
+    """Returns the compiled JSON validator for a request envelope, built once per payload model.
+
+    The envelope and its payload are parsed and validated in a single pass, so frames never
+    go through json.loads or an intermediate model.
+    """
+
+    return TypeAdapter(RelayEnvelope[payload_model or (dict | None)])
+
+
+ENVELOPE_HEADER_ADAPTER = TypeAdapter(RelayEnvelopeHeader)
+
+
+def discover_endpoints(shard_ids: Iterable[int] = ()):
+    """Discovers all endpoints in the endpoints directory and maps their channels on this node to them."""
 
     discovered_endpoints: list[RelayEndpoint] = []
 
@@ -91,4 +208,11 @@ def discover_endpoints():
 
             discovered_endpoints.append(endpoint_class())
 
-    RELAY_ENDPOINTS.extend(discovered_endpoints)
\ No newline at end of file
+    RELAY_ENDPOINTS.extend(discovered_endpoints)
+
+    for endpoint in discovered_endpoints:
+        for channel in endpoint.channels(shard_ids):
+            if channel in _ENDPOINT_TABLE:
+                raise ValueError(f"Endpoint {endpoint.__class__.__name__} reuses channel {channel}")
+
+            _ENDPOINT_TABLE[channel] = endpoint
\ No newline at end of file
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+from collections import defaultdict
+from http import HTTPStatus
+from time import perf_counter
+from typing import Any, Literal, TypeVar
+import aiohttp
+from howblox_lib import BaseModel, StatusCodes
+from .config import CONFIG
+from .member_codec import columnar_available, encode_member_batch
+from .metrics import BOT_API_REQUEST_SECONDS
+
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class RouteStats(BaseModel):
+    """Request statistics for one bot API route."""
+
+    requests: int = 0
+    errors: int = 0
+    total_latency: float = 0.0
+
+
+class BotAPIStats(BaseModel):
+    """Connection pool and request statistics for the bot API client."""
+
+    pool_limit: int
+    pool_acquired: int
+    pool_idle: int
+    in_flight: int
+    routes: dict[str, RouteStats]
+
+
+class BotAPIClient:
+    """The relay's HTTP client for the bot API.
+
+    Every call goes through one keep-alive connection pool with the authorization header
+    set once, and each route can have its own timeout.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        auth: str,
+        *,
+        max_connections: int,
+        keepalive_timeout: float,
+        default_timeout: float,
+        route_timeouts: dict[str, float],
+        member_batch_format: Literal["json", "columnar"] = "json",
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.auth = auth
+        self.max_connections = max_connections
+        self.keepalive_timeout = keepalive_timeout
+        self.default_timeout = default_timeout
+        self.route_timeouts = route_timeouts
+        self.member_batch_format = member_batch_format
+
+        if member_batch_format == "columnar" and not columnar_available():
+            logging.warning(
+                "Columnar member batches are configured but msgpack is not installed, sending JSON instead."
+            )
+            self.member_batch_format = "json"
+
+        self._session: aiohttp.ClientSession | None = None
+        self._in_flight = 0
+        self._route_stats: defaultdict[str, RouteStats] = defaultdict(RouteStats)
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The pooled client session, created on first use inside the running loop."""
+
+        if not self._session or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections,
+                    keepalive_timeout=self.keepalive_timeout,
+                ),
+                headers={"Authorization": self.auth},
+            )
+
+        return self._session
+
+    def timeout_for(self, route: str) -> aiohttp.ClientTimeout:
+        """Returns the configured timeout for a route, falling back to the default."""
+
+        return aiohttp.ClientTimeout(total=self.route_timeouts.get(route, self.default_timeout))
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        route: str,
+        body: Any = None,
+        data: bytes | None = None,
+        headers: dict[str, str] | None = None,
+        parse_as: Literal["JSON", "TEXT"] = "JSON",
+    ) -> tuple[Any, aiohttp.ClientResponse]:
+        """Sends a request to the bot API and returns the parsed body with the response.
+
+        The body is sent as JSON unless raw data is given instead. Non-2xx responses are
+        returned rather than raised; connection errors and timeouts propagate to the caller.
+        """
+
+        stats = self._route_stats[route]
+        started_at = perf_counter()
+        self._in_flight += 1
+
+        try:
+            async with self.session.request(
+                method,
+                f"{self.base_url}{path}",
+                json=body if data is None else None,
+                data=data,
+                headers=headers,
+                timeout=self.timeout_for(route),
+            ) as response:
+                if parse_as == "JSON":
+                    try:
+                        response_body = await response.json(content_type=None)
+                    except ValueError:
+                        response_body = None
+                else:
+                    response_body = await response.text()
+
+            if response.status >= 400:
+                stats.errors += 1
+
+            return response_body, response
+
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            stats.errors += 1
+            raise
+
+        finally:
+            latency = perf_counter() - started_at
+            self._in_flight -= 1
+            stats.requests += 1
+            stats.total_latency += latency
+            BOT_API_REQUEST_SECONDS.observe(latency, route)
+
+    async def request_typed(
+        self, model: type[M], method: str, path: str, *, route: str, body: Any = None
+    ) -> tuple[M | None, aiohttp.ClientResponse]:
+        """Sends a request and parses a successful JSON body into the given model."""
+
+        response_body, response = await self.request(method, path, route=route, body=body)
+
+        if response.status != StatusCodes.OK or not isinstance(response_body, dict):
+            return None, response
+
+        return model.model_validate(response_body), response
+
+    async def send_member_batch(
+        self,
+        path: str,
+        *,
+        route: str,
+        guild_id: int,
+        members: list[dict[str, Any]],
+        nonce: str | None = None,
+    ) -> tuple[Any, aiohttp.ClientResponse]:
+        """POSTs a batch of serialized members, in the columnar encoding if it is enabled.
+
+        If the bot API rejects the columnar encoding with 415, the client switches to
+        JSON for good and resends the batch.
+        """
+
+        if self.member_batch_format == "columnar":
+            data, headers = encode_member_batch(guild_id, members, nonce)
+            response_body, response = await self.request(
+                "POST", path, route=route, data=data, headers=headers
+            )
+
+            if response.status != HTTPStatus.UNSUPPORTED_MEDIA_TYPE:
+                return response_body, response
+
+            logging.warning("The bot API does not accept columnar member batches, falling back to JSON.")
+            self.member_batch_format = "json"
+
+        body = {"guild_id": guild_id, "members": members}
+
+        if nonce is not None:
+            body["nonce"] = nonce
+
+        return await self.request("POST", path, route=route, body=body)
+
+    def stats(self) -> BotAPIStats:
+        """Returns pool and per-route statistics for this client."""
+
+        connector = self._session.connector if self._session and not self._session.closed else None
+
+        # aiohttp does not expose pool occupancy publicly.
+        # pylint: disable=protected-access
+        return BotAPIStats(
+            pool_limit=self.max_connections,
+            pool_acquired=len(connector._acquired) if connector else 0,
+            pool_idle=sum(len(conns) for conns in connector._conns.values()) if connector else 0,
+            in_flight=self._in_flight,
+            routes=dict(self._route_stats),
+        )
+
+    async def close(self):
+        """Closes the pooled session."""
+
+        if self._session and not self._session.closed:
+            await self._session.close()
+            logging.info("Closed the bot API client session.")
+
+
+bot_api = BotAPIClient(
+    CONFIG.HTTP_BOT_API,
+    CONFIG.HTTP_BOT_AUTH,
+    max_connections=CONFIG.BOT_API_MAX_CONNECTIONS,
+    keepalive_timeout=CONFIG.BOT_API_KEEPALIVE_TIMEOUT,
+    default_timeout=CONFIG.BOT_API_TIMEOUT,
+    route_timeouts=CONFIG.BOT_API_ROUTE_TIMEOUTS,
+    member_batch_format=CONFIG.BOT_API_MEMBER_BATCH_FORMAT,
+)
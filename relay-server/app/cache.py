@@ -0,0 +1,102 @@
+import asyncio
+from collections import OrderedDict
+from time import monotonic
+from typing import Awaitable, Callable, Hashable, Generic, TypeVar
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """A bounded, in-process LRU cache whose entries expire after a TTL.
+
+    Concurrent misses for the same key are collapsed into a single load (single-flight),
+    and a load that was invalidated while in flight does not repopulate the cache.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self._loading: dict[K, asyncio.Future[V]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K) -> V | None:
+        """Returns the cached value for the key, or None if it is missing or expired."""
+
+        entry = self._entries.get(key)
+
+        if not entry:
+            return None
+
+        expires_at, value = entry
+
+        if expires_at <= monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+
+        return value
+
+    def set(self, key: K, value: V):
+        """Stores a value, evicting the least recently used entries past max_size."""
+
+        self._entries[key] = (monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: K):
+        """Drops a key, including any load for it that is still in flight."""
+
+        self._entries.pop(key, None)
+        self._loading.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[K], bool]):
+        """Drops every key matching the predicate."""
+
+        for key in [key for key in (*self._entries, *self._loading) if predicate(key)]:
+            self.invalidate(key)
+
+    def clear(self):
+        """Drops every entry."""
+
+        self._entries.clear()
+        self._loading.clear()
+
+    async def get_or_load(self, key: K, loader: Callable[[], Awaitable[V]]) -> V:
+        """Returns the cached value, calling the loader once for all concurrent misses.
+
+        None results are returned to every waiter but are not cached.
+        """
+
+        value = self.get(key)
+
+        if value is not None:
+            return value
+
+        load = self._loading.get(key)
+
+        if not load:
+            load = asyncio.ensure_future(loader())
+            load.add_done_callback(lambda future: self._loaded(key, future))
+            self._loading[key] = load
+
+        return await asyncio.shield(load)
+
+    def _loaded(self, key: K, load: asyncio.Future[V]):
+        """Stores the result of a finished load, unless it was invalidated meanwhile."""
+
+        if self._loading.get(key) is not load:
+            return
+
+        del self._loading[key]
+
+        if not load.cancelled() and not load.exception() and (value := load.result()) is not None:
+            self.set(key, value)
@@ -0,0 +1,316 @@
+import asyncio
+import logging
+import random
+from collections import OrderedDict, deque
+from http import HTTPStatus
+from time import monotonic
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Generic, Iterable, TypeVar
+import aiohttp
+from howblox_lib import StatusCodes
+from .config import CONFIG
+
+
+C = TypeVar("C")
+
+RETRYABLE_STATUSES = frozenset({HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.REQUEST_TIMEOUT})
+
+
+class AIMDRateLimiter:
+    """Paces requests, adapting the rate with additive increase and multiplicative decrease.
+
+    Each fast success raises the rate by a fixed step up to max_rate. Overload signals
+    (429, 5xx, timeouts or latency above the target) cut it by decrease_factor.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial_rate: float,
+        min_rate: float,
+        max_rate: float,
+        increase_step: float,
+        decrease_factor: float,
+        target_latency: float,
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.target_latency = target_latency
+        self.rate = min(max(initial_rate, min_rate), max_rate)
+
+        self._next_slot = monotonic()
+
+    async def acquire(self):
+        """Waits for the next send slot at the current rate."""
+
+        now = monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + 1 / self.rate
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def on_success(self, latency: float):
+        """Feeds back a successful request."""
+
+        if latency > self.target_latency:
+            self.on_overload()
+        else:
+            self.rate = min(self.rate + self.increase_step, self.max_rate)
+
+    def on_overload(self):
+        """Feeds back a request that signalled the upstream is overloaded."""
+
+        self.rate = max(self.rate * self.decrease_factor, self.min_rate)
+
+
+def create_rate_limiter(max_rate: float) -> AIMDRateLimiter:
+    """Creates a limiter using the configured verifyall AIMD settings."""
+
+    return AIMDRateLimiter(
+        initial_rate=CONFIG.VERIFYALL_INITIAL_RATE,
+        min_rate=CONFIG.VERIFYALL_MIN_RATE,
+        max_rate=max_rate,
+        increase_step=CONFIG.VERIFYALL_RATE_INCREASE,
+        decrease_factor=CONFIG.VERIFYALL_RATE_DECREASE_FACTOR,
+        target_latency=CONFIG.VERIFYALL_TARGET_LATENCY,
+    )
+
+
+# Shared by every verifyall job on this node, so the node as a whole respects the global ceiling.
+node_rate_limiter = create_rate_limiter(CONFIG.VERIFYALL_MAX_RATE)
+
+
+class RoundRobinLimiter:
+    """Hands out the send slots of a shared limiter to jobs in round-robin order.
+
+    Every job waiting for a slot gets one turn per round no matter how many chunks it
+    has queued, so a job with a large window cannot starve the others.
+    """
+
+    def __init__(self, limiter: AIMDRateLimiter):
+        self.limiter = limiter
+
+        self._waiters: OrderedDict[str, deque[asyncio.Future]] = OrderedDict()
+        self._granting: asyncio.Task | None = None
+
+    def for_job(self, job_id: str) -> "JobLimiter":
+        """Returns the limiter a job's dispatcher paces itself with."""
+
+        return JobLimiter(self, job_id)
+
+    async def acquire(self, job_id: str):
+        """Waits for the job's next turn."""
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(job_id, deque()).append(future)
+
+        if not self._granting or self._granting.done():
+            self._granting = asyncio.create_task(self._grant())
+
+        await future
+
+    async def _grant(self):
+        """Grants turns, one job at a time, until nobody is waiting."""
+
+        while self._waiters:
+            job_id, queue = next(iter(self._waiters.items()))
+            future = queue.popleft()
+
+            if queue:
+                self._waiters.move_to_end(job_id)
+            else:
+                del self._waiters[job_id]
+
+            if future.done():
+                continue
+
+            await self.limiter.acquire()
+
+            if not future.done():
+                future.set_result(None)
+
+
+class JobLimiter:
+    """One job's view of a RoundRobinLimiter, with the same interface as AIMDRateLimiter."""
+
+    def __init__(self, scheduler: RoundRobinLimiter, job_id: str):
+        self.scheduler = scheduler
+        self.job_id = job_id
+
+    async def acquire(self):
+        """Waits for the job's next turn."""
+
+        await self.scheduler.acquire(self.job_id)
+
+    def on_success(self, latency: float):
+        """Feeds back a successful request to the shared limiter."""
+
+        self.scheduler.limiter.on_success(latency)
+
+    def on_overload(self):
+        """Feeds back an overload signal to the shared limiter."""
+
+        self.scheduler.limiter.on_overload()
+
+
+# Paces every verifyall job on this node, taking turns between the guilds being scanned.
+node_scheduler = RoundRobinLimiter(node_rate_limiter)
+
+
+async def iterate_chunks(chunks: AsyncIterable[C] | Iterable[C]) -> AsyncIterator[C]:
+    """Iterates over sync and async chunk sources alike."""
+
+    if isinstance(chunks, AsyncIterable):
+        async for chunk in chunks:
+            yield chunk
+    else:
+        for chunk in chunks:
+            yield chunk
+
+
+class ChunkDispatcher(Generic[C]):
+    """Sends chunks with a bounded in-flight window, adaptive pacing and retries.
+
+    Chunks that fail with a retryable status or a connection error are retried with
+    exponential backoff; chunks that still fail are logged and skipped rather than
+    aborting the remaining chunks.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[C], Awaitable[int]],
+        limiters: Iterable[AIMDRateLimiter | JobLimiter],
+        *,
+        window_size: int,
+        max_retries: int,
+        retry_delay: float,
+    ):
+        self.send = send
+        self.limiters = tuple(limiters)
+        self.window_size = window_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self.failed_chunks: list[int] = []
+        self._error: BaseException | None = None
+
+    async def run(
+        self,
+        chunks: AsyncIterable[C] | Iterable[C],
+        on_sent: Callable[[int, C], Awaitable[None]] | None = None,
+        on_failed: Callable[[int, C], Awaitable[None]] | None = None,
+    ):
+        """Sends every chunk, calling on_sent with the 1-based chunk index after each delivery.
+
+        on_failed is called the same way for every chunk that is given up on.
+
+        Chunks are only pulled from the iterable once a slot in the window is free, so a
+        lazy source never has more than window_size chunks materialized.
+
+        An exception raised by on_sent or on_failed stops dispatching and is re-raised once the
+        chunks still in flight have been cancelled.
+        """
+
+        window = asyncio.Semaphore(self.window_size)
+        in_flight: set[asyncio.Task] = set()
+        chunk_iterator = aiter(iterate_chunks(chunks))
+        index = 0
+
+        try:
+            while True:
+                await window.acquire()
+
+                if self._error:
+                    break
+
+                try:
+                    chunk = await anext(chunk_iterator)
+                except StopAsyncIteration:
+                    window.release()
+                    break
+
+                index += 1
+
+                for limiter in self.limiters:
+                    await limiter.acquire()
+
+                task = asyncio.create_task(self._deliver(index, chunk, on_sent, on_failed))
+                task.add_done_callback(lambda _: window.release())
+                task.add_done_callback(in_flight.discard)
+                in_flight.add(task)
+
+            if not self._error:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+            await chunk_iterator.aclose()
+
+        if self._error:
+            raise self._error
+
+    async def _deliver(
+        self,
+        index: int,
+        chunk: C,
+        on_sent: Callable[[int, C], Awaitable[None]] | None,
+        on_failed: Callable[[int, C], Awaitable[None]] | None,
+    ):
+        """Sends one chunk, retrying it until it succeeds or runs out of attempts."""
+
+        try:
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    delay = self.retry_delay * 2 ** (attempt - 1) * random.uniform(1, 1.5)
+                    logging.debug(f"Retrying chunk {index} in {delay:.1f}s (attempt {attempt + 1})")
+                    await asyncio.sleep(delay)
+
+                    for limiter in self.limiters:
+                        await limiter.acquire()
+
+                started_at = monotonic()
+
+                try:
+                    status = await self.send(chunk)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                    logging.warning(f"Chunk {index} request failed: {ex!r}")
+                    self._feedback_overload()
+                    continue
+
+                if status == StatusCodes.OK:
+                    latency = monotonic() - started_at
+
+                    for limiter in self.limiters:
+                        limiter.on_success(latency)
+
+                    if on_sent:
+                        await on_sent(index, chunk)
+
+                    return
+
+                if status in RETRYABLE_STATUSES or status >= 500:
+                    logging.warning(f"Chunk {index} was rejected with {status}, backing off.")
+                    self._feedback_overload()
+                    continue
+
+                logging.error(f"Chunk {index} was rejected with {status}, skipping it.")
+                break
+
+            self.failed_chunks.append(index)
+
+            if on_failed:
+                await on_failed(index, chunk)
+
+        except BaseException as ex:
+            self._error = self._error or ex
+            raise
+
+    def _feedback_overload(self):
+        """Tells every limiter the upstream is overloaded."""
+
+        for limiter in self.limiters:
+            limiter.on_overload()
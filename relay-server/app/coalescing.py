@@ -0,0 +1,125 @@
+"""
+Single-flight coalescing of identical relay requests.
+
+Endpoints created with coalesce=True run identical concurrent requests once. The first
+request is handled and serialized, and every identical request arriving while it is
+queued or running gets the same body, re-addressed to its own nonce. Identical requests
+are matched before admission, so they take neither a queue slot nor a handler slot.
+"""
+import json
+import asyncio
+import contextlib
+from typing import Iterator
+from howblox_lib import BaseModel
+from .base import RelayEndpoint, RelayRequest
+from .metrics import RELAY_COALESCED_REQUESTS
+from .publisher import RawJSON
+from .types import Response
+
+
+CoalesceKey = tuple[str, str]
+# Resolves to the nonce and serialized body of the request being handled.
+Flight = asyncio.Future[tuple[str | None, RawJSON | None]]
+
+
+def coalesce_key(endpoint: RelayEndpoint, payload: BaseModel | dict | None) -> CoalesceKey:
+    """Returns the key identical requests share: the endpoint and its normalized payload.
+
+    Payload models are dumped after validation, so aliases, defaults and field order no
+    longer matter.
+    """
+
+    if isinstance(payload, BaseModel):
+        normalized = payload.model_dump_json()
+    else:
+        normalized = json.dumps(payload, sort_keys=True)
+
+    return str(endpoint.path), normalized
+
+
+def serialize_body(response: BaseModel | dict | list | RawJSON | None) -> RawJSON | None:
+    """Serializes a handler's response once, so it can be shared."""
+
+    if response is None or isinstance(response, RawJSON):
+        return response
+
+    if isinstance(response, BaseModel):
+        return RawJSON(response.model_dump_json())
+
+    return RawJSON(json.dumps(response))
+
+
+def readdress(body: RawJSON | None, nonce: str | None, new_nonce: str | None) -> RawJSON | None:
+    """Swaps the leading nonce of a serialized Response body for another request's nonce.
+
+    Response declares nonce as its first field, so it always leads the body. Bodies
+    without it are shared unchanged.
+    """
+
+    prefix = f'{{"nonce":{json.dumps(nonce)}'
+
+    if not body or not body.startswith(prefix):
+        return body
+
+    return RawJSON(f'{{"nonce":{json.dumps(new_nonce)}{body[len(prefix):]}')
+
+
+class RequestCoalescer:
+    """Tracks the in-flight requests of coalescing endpoints by their coalesce key."""
+
+    def __init__(self):
+        self._in_flight: dict[CoalesceKey, Flight] = {}
+
+    def leader(self, key: CoalesceKey) -> Flight | None:
+        """Returns the future of the identical request in flight, if there is one."""
+
+        return self._in_flight.get(key)
+
+    async def follow(self, key: CoalesceKey, leader: Flight, request: RelayRequest) -> RawJSON | None:
+        """Waits for the identical request in flight and returns its body, re-addressed to this request.
+
+        If the request in flight never produced a body, this one gets an error reply instead.
+        """
+
+        RELAY_COALESCED_REQUESTS.inc(key[0])
+
+        try:
+            leader_nonce, body = await asyncio.shield(leader)
+        except asyncio.CancelledError:
+            if not leader.cancelled():
+                raise
+
+            return serialize_body(Response(
+                success=False,
+                nonce=request.nonce,
+                error="The identical request being handled failed, try again.",
+            ))
+
+        return readdress(body, leader_nonce, request.nonce)
+
+    @contextlib.contextmanager
+    def lead(self, key: CoalesceKey | None) -> Iterator[Flight | None]:
+        """Makes a request the one identical requests wait for while the block runs.
+
+        The block resolves the yielded future with the request's nonce and serialized body.
+        Leaving it without doing so, on an error, an expired request or a cancellation, cancels
+        the future and the waiting requests get an error reply. Yields None for requests that
+        are not coalesced.
+        """
+
+        if key is None:
+            yield None
+            return
+
+        future = self._in_flight[key] = asyncio.get_running_loop().create_future()
+
+        try:
+            yield future
+        finally:
+            del self._in_flight[key]
+
+            if not future.done():
+                future.cancel()
+
+
+request_coalescer = RequestCoalescer()
@@ -1,6 +1,8 @@
+import json
 from typing import Literal
 from os import getcwd, environ
 from dotenv import load_dotenv
+from pydantic import field_validator
 from howblox_lib import Config as HOWBLOX_CONFIG, get_environment
 
 load_dotenv(f"{getcwd()}/.env")
@@ -21,6 +23,103 @@ class Config(HOWBLOX_CONFIG):
     PORT: int = 8020
     HOST: str = "0.0.0.0"
 
+    # Gateway cache. "lean" caches only what the relay reads, see Howblox.
+    GATEWAY_CACHE_MODE: Literal["default", "lean"] = "default"
+    MEMORY_STATS_INTERVAL: float = 60.0
+    MEMORY_STATS_SAMPLE_SIZE: int = 100
+    MEMORY_STATS_TOP_GUILDS: int = 25
+
+    # Diagnostics
+    LOOP_LAG_INTERVAL: float = 0.1
+    LOOP_STALL_THRESHOLD: float = 0.5
+    PROFILER_INTERVAL: float = 0.005
+    PROFILER_MAX_DURATION: float = 300.0
+    PROFILER_OUTPUT_DIR: str = "/tmp/relay-profiles"
+
+    # Relay dispatcher
+    RELAY_ENDPOINT_CONCURRENCY: int = 64
+    RELAY_ENDPOINT_CONCURRENCY_LIMITS: dict[str, int] = {}
+    RELAY_ENDPOINT_QUEUE_LIMIT: int = 1024
+    RELAY_ENDPOINT_QUEUE_LIMITS: dict[str, int] = {}
+    RELAY_MAX_IN_FLIGHT: int = 256
+    RELAY_REQUEST_MAX_AGE: float = 30.0
+    RELAY_RECONNECT_MIN_DELAY: float = 0.5
+    RELAY_RECONNECT_MAX_DELAY: float = 30.0
+    RELAY_CLIENT_TIMEOUT: float = 5.0
+    RELAY_SHARED_CHANNELS: bool = True
+
+    # Relay streams, for endpoints whose requests must survive a node restart
+    RELAY_STREAM_ENDPOINTS: list[str] = []
+    RELAY_STREAM_BATCH_SIZE: int = 32
+    RELAY_STREAM_BLOCK: float = 5.0
+    RELAY_STREAM_MAX_PENDING: int = 256
+    RELAY_STREAM_MAXLEN: int = 10_000
+    RELAY_STREAM_CLAIM_IDLE: float = 60.0
+    RELAY_STREAM_CLAIM_INTERVAL: float = 30.0
+
+    # Response publisher
+    RELAY_PUBLISH_FLUSH_INTERVAL: float = 0.001
+    RELAY_PUBLISH_MAX_BATCH_SIZE: int = 256
+    RELAY_PUBLISH_MAX_CONNECTIONS: int = 8
+
+    # Local caches
+    PREMIUM_CACHE_TTL: float = 300.0
+    PREMIUM_CACHE_MAX_SIZE: int = 10_000
+    # Short until the API and dashboard publish INVALIDATE:GUILD_SETTINGS, see guild_settings.
+    GUILD_SETTINGS_CACHE_TTL: float = 60.0
+    GUILD_SETTINGS_CACHE_MAX_SIZE: int = 50_000
+    GUILD_SNAPSHOT_CACHE_TTL: float = 300.0
+    GUILD_SNAPSHOT_CACHE_MAX_SIZE: int = 10_000
+
+    # Bot API client
+    BOT_API_MAX_CONNECTIONS: int = 100
+    BOT_API_KEEPALIVE_TIMEOUT: float = 30.0
+    BOT_API_TIMEOUT: float = 10.0
+    BOT_API_ROUTE_TIMEOUTS: dict[str, float] = {"verifyall": 120.0}
+    BOT_API_MEMBER_BATCH_FORMAT: Literal["json", "columnar"] = "json"
+
+    # Member join forwarding
+    MEMBER_JOIN_BATCH_WINDOW: float = 0.5
+    MEMBER_JOIN_BATCH_SIZE: int = 100
+    # Only enable once the bot API serves POST /api/users/join.
+    MEMBER_JOIN_BULK_ROUTE: bool = False
+
+    # Endpoints
+    VERIFICATION_CONCURRENCY: int = 10
+    VERIFICATION_DEADLINE: float = 30.0
+    CACHE_LOOKUP_MAX_PART_SIZE: int = 512 * 1024
+
+    # Verifyall chunk dispatch, rates are in chunks per second
+    VERIFYALL_WINDOW_SIZE: int = 4
+    VERIFYALL_INITIAL_RATE: float = 1.0
+    VERIFYALL_MIN_RATE: float = 0.1
+    VERIFYALL_MAX_RATE: float = 20.0
+    VERIFYALL_GUILD_MAX_RATES: dict[int, float] = {}
+    VERIFYALL_RATE_INCREASE: float = 0.5
+    VERIFYALL_RATE_DECREASE_FACTOR: float = 0.5
+    VERIFYALL_TARGET_LATENCY: float = 5.0
+    VERIFYALL_MAX_RETRIES: int = 5
+    VERIFYALL_RETRY_DELAY: float = 1.0
+    VERIFYALL_MEMBER_SOURCE: Literal["cache", "pages"] = "cache"
+    # Verifyall jobs
+    VERIFYALL_MAX_CONCURRENT_JOBS: int = 2
+    VERIFYALL_LOCK_TTL: float = 60.0
+    VERIFYALL_JOB_TTL: float = 24 * 60 * 60
+
+    @field_validator(
+        "BOT_API_ROUTE_TIMEOUTS",
+        "VERIFYALL_GUILD_MAX_RATES",
+        "RELAY_STREAM_ENDPOINTS",
+        "RELAY_ENDPOINT_CONCURRENCY_LIMITS",
+        "RELAY_ENDPOINT_QUEUE_LIMITS",
+        mode="before",
+    )
+    @classmethod
+    def parse_json_mapping(cls, value):
+        """Mappings and lists are given as JSON when set from the environment."""
+
+        return json.loads(value) if isinstance(value, str) else value
+
     def model_post_init(self, __context):
         if get_environment() != "STAGING":
             if self.SHARD_COUNT < 1:
@@ -29,6 +128,15 @@ class Config(HOWBLOX_CONFIG):
             if self.SHARDS_PER_NODE < 1:
                 raise ValueError("SHARDS_PER_NODE must be at least 1")
 
+        if self.RELAY_STREAM_MAX_PENDING < 1:
+            raise ValueError("RELAY_STREAM_MAX_PENDING must be at least 1")
+
+        if self.RELAY_ENDPOINT_CONCURRENCY < 1:
+            raise ValueError("RELAY_ENDPOINT_CONCURRENCY must be at least 1")
+
+        if self.RELAY_MAX_IN_FLIGHT < 1:
+            raise ValueError("RELAY_MAX_IN_FLIGHT must be at least 1")
+
 
 
 CONFIG: Config = Config(
@@ -1,9 +1,8 @@
+from inspect import signature
 from typing import Callable, get_type_hints
 from functools import wraps
-from howblox_lib import fetch_typed, StatusCodes
 import discord
-from app.types import PremiumResponse
-from app.config import CONFIG
+from app.premium import get_guild_premium
 
 
 def guild_premium_required(fn: Callable):
@@ -12,28 +11,28 @@ def guild_premium_required(fn: Callable):
     expects the callback to have either a guild or member parameter
     """
 
+    type_hints = get_type_hints(fn)
+    guild_index: int | None = None
+    from_member = False
+
+    # find the guild argument from the type hints once, instead of on every call
+    for i, arg_name in enumerate(signature(fn).parameters):
+        arg_hint = type_hints.get(arg_name)
+
+        if arg_hint in (discord.Guild, discord.Member):
+            guild_index = i
+            from_member = arg_hint == discord.Member
+            break
+
+    if guild_index is None:
+        raise ValueError("Function must have either a member or guild parameter")
+
     @wraps(fn)
     async def wrapper(*args):
-        type_hints = get_type_hints(fn)
-        guild: discord.Guild | None = None
-
-        # find the guild from the type hints
-        for i, arg_hint in enumerate(type_hints.values()):
-            if arg_hint == discord.Guild:
-                guild = args[i]
-            elif arg_hint == discord.Member:
-                guild = args[i].guild
-
-        if not guild:
-            raise ValueError("Function must have either a member or guild parameter")
-
-        json_response, response = await fetch_typed(
-            PremiumResponse,
-            f"{CONFIG.HTTP_BOT_API}/api/premium/guilds/{guild.id}",
-            headers={"Authorization": CONFIG.HTTP_BOT_AUTH},
-        )
-
-        if response.status == StatusCodes.OK and json_response.premium:
+        guild: discord.Guild = args[guild_index].guild if from_member else args[guild_index]
+        premium_status = await get_guild_premium(guild.id)
+
+        if premium_status.premium:
             return await fn(*args)
 
-    return wrapper
\ No newline at end of file
+    return wrapper
@@ -0,0 +1,180 @@
+"""
+Event loop diagnostics: a lag monitor and an on-demand sampling profiler.
+
+Both watch the loop from a separate thread, so they still see a loop that is blocked.
+The profiler writes folded stacks (one "frame;frame;frame count" line per stack),
+which flamegraph.pl and speedscope read directly.
+"""
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+from howblox_lib import create_task_log_exception
+from .config import CONFIG
+from .metrics import Histogram, registry
+
+
+EVENT_LOOP_LAG_SECONDS = registry.register(Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop ran a timer callback.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+))
+
+
+def describe_task(task: asyncio.Task | None) -> str:
+    """Names a task and the coroutine it runs."""
+
+    if not task:
+        return "no task (a plain callback)"
+
+    coro = task.get_coro()
+
+    return f"task {task.get_name()} running {getattr(coro, '__qualname__', coro)}"
+
+
+def fold_stack(frame: FrameType | None) -> str:
+    """Folds a stack into one root-first line of file:function frames."""
+
+    frames = []
+
+    while frame:
+        frames.append(f"{Path(frame.f_code.co_filename).name}:{frame.f_code.co_name}")
+        frame = frame.f_back
+
+    return ";".join(reversed(frames))
+
+
+class LoopLagMonitor:
+    """Measures event loop lag and reports what the loop was doing when it stalled.
+
+    A timer on the loop records how late it wakes up and leaves a heartbeat. A watchdog
+    thread logs the loop thread's stack and current task once the heartbeat is older
+    than stall_threshold, so the callback that blocks the loop is caught in the act.
+    """
+
+    def __init__(self, interval: float, stall_threshold: float):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+
+        self._heartbeat = time.monotonic()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+
+    async def run(self):
+        """Ticks on the loop and starts the watchdog thread."""
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+
+            self._heartbeat = now = time.monotonic()
+            EVENT_LOOP_LAG_SECONDS.observe(max(now - expected, 0))
+
+    def _watch(self):
+        """Logs the loop thread's stack once per stall."""
+
+        reported_heartbeat = None
+
+        while True:
+            time.sleep(self.stall_threshold / 2)
+
+            heartbeat = self._heartbeat
+            stalled_for = time.monotonic() - heartbeat
+
+            if stalled_for < self.stall_threshold or heartbeat == reported_heartbeat:
+                continue
+
+            reported_heartbeat = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)  # pylint: disable=protected-access
+            task = asyncio.current_task(self._loop)
+
+            logging.warning(
+                "Event loop blocked for %.3fs by %s:\n%s",
+                stalled_for, describe_task(task), "".join(traceback.format_stack(frame)),
+            )
+
+
+class SamplingProfiler:
+    """Samples the event loop thread's stack from another thread while started."""
+
+    def __init__(self, interval: float, max_duration: float, output_dir: str):
+        self.interval = interval
+        self.max_duration = max_duration
+        self.output_dir = Path(output_dir)
+
+        self.stacks: Counter[str] = Counter()
+        self.started_at: float | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the profiler is sampling."""
+
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self, duration: float | None = None):
+        """Starts sampling the calling thread, stopping on its own after duration seconds."""
+
+        if self.running:
+            raise RuntimeError("The profiler is already running.")
+
+        self.stacks = Counter()
+        self.started_at = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._sample,
+            args=(threading.get_ident(), min(duration or self.max_duration, self.max_duration)),
+            name="sampling-profiler",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> Path:
+        """Stops sampling and writes the folded stacks. Returns the path of the profile."""
+
+        self._stop.set()
+
+        if self._thread:
+            self._thread.join()
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"relay-{int(self.started_at or time.time())}.folded"
+        path.write_text(self.folded())
+
+        return path
+
+    def folded(self) -> str:
+        """Returns the samples as folded stacks."""
+
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def _sample(self, thread_id: int, duration: float):
+        """Records the target thread's stack every interval until stopped or out of time."""
+
+        deadline = time.monotonic() + duration
+
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)  # pylint: disable=protected-access
+
+            if frame:
+                self.stacks[fold_stack(frame)] += 1
+
+
+loop_monitor = LoopLagMonitor(interval=CONFIG.LOOP_LAG_INTERVAL, stall_threshold=CONFIG.LOOP_STALL_THRESHOLD)
+profiler = SamplingProfiler(
+    interval=CONFIG.PROFILER_INTERVAL,
+    max_duration=CONFIG.PROFILER_MAX_DURATION,
+    output_dir=CONFIG.PROFILER_OUTPUT_DIR,
+)
+
+create_task_log_exception(loop_monitor.run())
@@ -1,8 +1,13 @@
-from typing import Literal
-from pydantic import Field
+import json
+from typing import Callable, Literal
+from pydantic import Field, TypeAdapter
+import discord
 from discord import ChannelType, TextChannel
 from howblox_lib import BaseModel
-from ..base import RelayEndpoint
+from ..base import RelayEndpoint, RequestPriority
+from ..config import CONFIG
+from ..guild_snapshots import SnapshotType, get_snapshot
+from ..publisher import RawJSON
 from ..types import Response
 from ..redis import RedisRelayRequest
 from ..howblox import howblox
@@ -45,80 +50,189 @@ class EndpointResponse(Response):
     result: GuildData | list[RoleData] | list[ChannelData]
 
 
+ROLES_ADAPTER = TypeAdapter(list[RoleData])
+CHANNELS_ADAPTER = TypeAdapter(list[ChannelData])
+
+
 class Payload(BaseModel):
     guild_id: int = Field(alias="guildID")
     type: Literal["channels", "roles", "guild"]
 
 
+class BatchPayload(BaseModel):
+    guild_ids: list[int] = Field(alias="guildIDs")
+    types: set[Literal["channels", "roles", "guild"]]
+
+
+def snapshot_response(
+    nonce: str | None, snapshot: RawJSON, *, part: int | None = None, parts: int | None = None
+) -> RawJSON:
+    """Wraps a serialized snapshot in the body of a successful Response.
+
+    Responses split into several parts carry their 1-based part number and the part count.
+    """
+
+    body = f'"nonce":{json.dumps(nonce)},"result":{snapshot},"success":true,"error":null'
+
+    if part is not None:
+        body = f'{body},"part":{part},"parts":{parts}'
+
+    return RawJSON(f"{{{body}}}")
+
+
+def build_guild_snapshot(guild: discord.Guild) -> RawJSON:
+    """Serializes the data of a guild."""
+
+    return RawJSON(GuildData(
+        id=guild.id,
+        name=guild.name,
+        icon=guild.icon,
+        owner=guild.owner_id,
+        splash=guild.splash,
+        totalMembers=guild.member_count or 0,
+        createdDate=int(guild.created_at.timestamp())
+    ).model_dump_json())
+
+
+def build_roles_snapshot(guild: discord.Guild) -> RawJSON:
+    """Serializes the roles of a guild."""
+
+    return RawJSON(ROLES_ADAPTER.dump_json([RoleData(
+        id=role.id,
+        name=role.name,
+        color=str(role.color),
+        hoist=role.hoist,
+        position=role.position,
+        permissions=role.permissions.value,
+        managed=role.managed
+    ) for role in guild.roles]).decode())
+
+
+def build_channels_snapshot(guild: discord.Guild) -> RawJSON:
+    """Serializes the categories and text channels of a guild, in channel list order."""
+
+    channel_result: list[ChannelData] = []
+
+    for category, channels in guild.by_category():
+        if category:
+            channel_result.append(ChannelData(
+                id=category.id,
+                name=category.name,
+                position=category.position,
+                type=ChannelType.category
+            ))
+
+        for channel in channels:
+            if isinstance(channel, TextChannel):
+                channel_result.append(ChannelData(
+                    id=channel.id,
+                    name=channel.name,
+                    position=channel.position,
+                    type=ChannelType.text
+                ))
+
+    return RawJSON(CHANNELS_ADAPTER.dump_json(channel_result).decode())
+
+
+SNAPSHOT_BUILDERS: dict[SnapshotType, Callable[[discord.Guild], RawJSON]] = {
+    "guild": build_guild_snapshot,
+    "roles": build_roles_snapshot,
+    "channels": build_channels_snapshot,
+}
+
+
+def lookup_snapshot(guild: discord.Guild, lookup_type: SnapshotType) -> RawJSON:
+    """Returns the cached snapshot of a guild for a lookup type, building it on a miss."""
+
+    return get_snapshot(guild.id, lookup_type, lambda: SNAPSHOT_BUILDERS[lookup_type](guild))
+
+
 class CacheLookupEndpoint(RelayEndpoint[Payload]):
-    """An endpoint for getting information from the cache."""
+    """An endpoint for getting information from the cache.
+
+    Results are served from per-guild snapshots of the serialized JSON, which gateway
+    events invalidate when the guild, its member count, its roles or its channels change.
+    """
 
     def __init__(self):
-        super().__init__("CACHE_LOOKUP", Payload)
+        super().__init__(
+            "CACHE_LOOKUP", Payload, priority=RequestPriority.HIGH, sharded=True, coalesce=True
+        )
 
-    async def handle(self, request: RedisRelayRequest[Payload]) -> Response:
+    async def handle(self, request: RedisRelayRequest[Payload]) -> Response | RawJSON:
         payload = request.payload
-        guild_id = payload.guild_id
-
-        guild = howblox.get_guild(guild_id)
+        guild = howblox.get_guild(payload.guild_id)
 
         if not guild:
             return
 
-        match payload.type:
-            case "guild":
-                return Response(
-                    success=True,
-                    nonce=request.nonce,
-                    result=GuildData(
-                        id=guild.id,
-                        name=guild.name,
-                        icon=guild.icon,
-                        owner=guild.owner_id,
-                        splash=guild.splash,
-                        totalMembers=len(guild.members),
-                        createdDate=guild.created_at.timestamp()
-                    )
-                )
-            case "roles":
-                return Response(
-                    success=True,
-                    nonce=request.nonce,
-                    result=[RoleData(
-                        id=role.id,
-                        name=role.name,
-                        color=str(role.color),
-                        hoist=role.hoist,
-                        position=role.position,
-                        permissions=role.permissions.value,
-                        managed=role.managed
-                    ) for role in guild.roles]
-                )
-            case "channels":
-                channel_result: list[ChannelData] = []
-
-                for category, channels in guild.by_category():
-                    if category:
-                        channel_result.append(ChannelData(
-                            id=category.id,
-                            name=category.name,
-                            position=category.position,
-                            type=ChannelType.category
-                        ))
-
-                    for channel in channels:
-                        if isinstance(channel, TextChannel):
-                            channel_result.append(ChannelData(
-                                id=channel.id,
-                                name=channel.name,
-                                position=channel.position,
-                                type=ChannelType.text
-                            ))
-
-                return Response(
-                    success=True,
-                    nonce=request.nonce,
-                    result=channel_result
-                )
-            case _:
-                return Response(success=False, nonce=request.nonce)
\ No newline at end of file
+        if payload.type not in SNAPSHOT_BUILDERS:
+            return Response(success=False, nonce=request.nonce)
+
+        return snapshot_response(request.nonce, lookup_snapshot(guild, payload.type))
+
+
+def split_parts(entries: list[str], max_part_size: int) -> list[str]:
+    """Joins serialized object entries into parts of roughly max_part_size characters.
+
+    An entry is never split, so a part holding a single large entry may exceed the limit.
+    """
+
+    parts: list[str] = []
+    part: list[str] = []
+    part_size = 0
+
+    for entry in entries:
+        if part and part_size + len(entry) > max_part_size:
+            parts.append(",".join(part))
+            part, part_size = [], 0
+
+        part.append(entry)
+        part_size += len(entry) + 1
+
+    parts.append(",".join(part))
+
+    return parts
+
+
+class CacheLookupBatchEndpoint(RelayEndpoint[BatchPayload]):
+    """An endpoint for looking up several guilds and lookup types in one request.
+
+    The result maps each guild held by this node to its requested lookups, for example
+    {"<guild id>": {"roles": [...], "channels": [...]}}. Nodes holding none of the guilds
+    do not reply. Results larger than CACHE_LOOKUP_MAX_PART_SIZE are sent as several
+    replies, each with part and parts set and a slice of the guilds in its result.
+    """
+
+    def __init__(self):
+        super().__init__("CACHE_LOOKUP:BATCH", BatchPayload, priority=RequestPriority.HIGH)
+
+    async def handle(self, request: RedisRelayRequest[BatchPayload]) -> RawJSON:
+        payload = request.payload
+        lookup_types = [lookup_type for lookup_type in SNAPSHOT_BUILDERS if lookup_type in payload.types]
+        entries: list[str] = []
+
+        for guild_id in dict.fromkeys(payload.guild_ids):
+            guild = howblox.get_guild(guild_id)
+
+            if not guild:
+                continue
+
+            lookups = ",".join(
+                f'"{lookup_type}":{lookup_snapshot(guild, lookup_type)}' for lookup_type in lookup_types
+            )
+            entries.append(f'"{guild.id}":{{{lookups}}}')
+
+        if not entries:
+            return
+
+        parts = split_parts(entries, CONFIG.CACHE_LOOKUP_MAX_PART_SIZE)
+
+        for part, part_entries in enumerate(parts[:-1], start=1):
+            await request.respond(
+                snapshot_response(request.nonce, RawJSON(f"{{{part_entries}}}"), part=part, parts=len(parts))
+            )
+
+        return snapshot_response(
+            request.nonce, RawJSON(f"{{{parts[-1]}}}"), part=len(parts), parts=len(parts)
+        )
@@ -0,0 +1,36 @@
+from howblox_lib import BaseModel
+from ..base import RelayEndpoint
+from ..redis import RedisRelayRequest
+from ..guild_settings import invalidate_guild_settings, GUILD_SETTINGS_INVALIDATION_CHANNEL
+from ..premium import premium_cache
+
+
+class Payload(BaseModel):
+    """Payload for the cache invalidation endpoints. Omitting the guild drops every entry."""
+
+    guild_id: int | None = None
+
+
+class PremiumInvalidationEndpoint(RelayEndpoint[Payload]):
+    """An endpoint for dropping locally cached premium statuses after they change."""
+
+    def __init__(self):
+        super().__init__("INVALIDATE:PREMIUM", Payload)
+
+    async def handle(self, request: RedisRelayRequest[Payload]) -> None:
+        guild_id = request.payload.guild_id
+
+        if guild_id is None:
+            premium_cache.clear()
+        else:
+            premium_cache.invalidate(guild_id)
+
+
+class GuildSettingsInvalidationEndpoint(RelayEndpoint[Payload]):
+    """An endpoint for dropping locally cached guild settings after they are written."""
+
+    def __init__(self):
+        super().__init__(GUILD_SETTINGS_INVALIDATION_CHANNEL, Payload)
+
+    async def handle(self, request: RedisRelayRequest[Payload]) -> None:
+        invalidate_guild_settings(request.payload.guild_id)
@@ -0,0 +1,60 @@
+from typing import Literal
+from howblox_lib import BaseModel
+from ..base import RelayEndpoint, RequestPriority
+from ..diagnostics import profiler
+from ..howblox import howblox
+from ..redis import RedisRelayRequest
+from ..types import Response
+
+
+class Payload(BaseModel):
+    """Payload for the profiler endpoint."""
+
+    action: Literal["start", "stop"]
+    node_id: int | None = None
+    duration: float | None = None
+    include_profile: bool = False
+
+
+class ProfileResult(BaseModel):
+    """Where a profile was written, optionally with its folded stacks."""
+
+    path: str
+    samples: int
+    profile: str | None = None
+
+
+class ProfilerEndpoint(RelayEndpoint[Payload]):
+    """An endpoint for starting and stopping the sampling profiler of a node, or of every node."""
+
+    def __init__(self):
+        super().__init__("PROFILER", Payload, priority=RequestPriority.HIGH)
+
+    async def handle(self, request: RedisRelayRequest[Payload]) -> Response:
+        payload = request.payload
+
+        if payload.node_id is not None and payload.node_id != howblox.node_id:
+            return
+
+        if payload.action == "start":
+            if profiler.running:
+                return Response(success=False, nonce=request.nonce, error="The profiler is already running.")
+
+            profiler.start(payload.duration)
+
+            return Response(success=True, nonce=request.nonce)
+
+        if profiler.started_at is None:
+            return Response(success=False, nonce=request.nonce, error="The profiler was not started.")
+
+        path = profiler.stop()
+
+        return Response(
+            success=True,
+            nonce=request.nonce,
+            result=ProfileResult(
+                path=str(path),
+                samples=profiler.stacks.total(),
+                profile=profiler.folded() if payload.include_profile else None,
+            ),
+        )
\ No newline at end of file
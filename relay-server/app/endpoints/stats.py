@@ -1,31 +1,42 @@
 import time
 from datetime import timedelta
-from howblox_lib import get_node_id, BaseModel
-from ..base import RelayEndpoint
+from howblox_lib import get_node_id
+from ..base import RelayEndpoint, RequestPriority
+from ..bot_api import bot_api, BotAPIStats
+from ..memory import CacheMemory, cache_accountant
 from ..redis import RedisRelayRequest
 from ..howblox import howblox
 from ..types import Response
 
 
 class StatsResponse(Response):
-    """Response from the stats command."""
+    """Response from the stats command.
+
+    user_count counts cached users, so it is None in the lean cache mode, where members
+    are not cached. cache is the last background measurement, None until the first one.
+    """
 
     node_id: int
     guild_count: int
-    user_count: int
+    user_count: int | None
     uptime: timedelta
+    bot_api: BotAPIStats
+    cache: CacheMemory | None
 
 
 class InformationEndpoint(RelayEndpoint):
     """An endpoint for getting information about the current node."""
 
     def __init__(self):
-        super().__init__("REQUEST_STATS")
+        super().__init__("REQUEST_STATS", priority=RequestPriority.HIGH, coalesce=True)
 
     async def handle(self, request: RedisRelayRequest) -> StatsResponse:
         return StatsResponse(
+            nonce=request.nonce,
             node_id=get_node_id(),
             guild_count=len(howblox.guilds),
-            user_count=len(howblox.users),
-            uptime=timedelta(seconds=time.time() - howblox.started_at)
+            user_count=None if howblox.lean_cache else len(howblox.users),
+            uptime=timedelta(seconds=time.time() - howblox.started_at),
+            bot_api=bot_api.stats(),
+            cache=cache_accountant.snapshot,
         )
\ No newline at end of file
@@ -1,6 +1,9 @@
+import asyncio
 import logging
-from howblox_lib import BaseModel, fetch, StatusCodes
+import aiohttp
+from howblox_lib import BaseModel, StatusCodes
 from ..base import RelayEndpoint
+from ..bot_api import bot_api
 from ..config import CONFIG
 from ..redis import RedisRelayRequest
 from ..howblox import howblox
@@ -15,41 +18,90 @@ class Payload(BaseModel):
     guild_ids: list[int]
 
 
+class GuildUpdateResult(BaseModel):
+    """The outcome of updating the user in one guild."""
+
+    guild_id: int
+    success: bool
+    status: int | None = None
+    error: str | None = None
+
+
 class VerificationEndpoint(RelayEndpoint[Payload]):
     """An endpoint for remotely updating a user.
 
     TODO: make this an endpoint on the http bot itself after MVP. This is on the relay server for compatibility with API.
 
+    Requests name guilds on any number of shards, so the endpoint is not sharded: every node
+    receives them and updates the user in the guilds it holds.
     """
 
     def __init__(self):
         super().__init__("VERIFICATION", Payload)
 
+    async def update_guild(
+        self, guild_id: int, user_id: int, semaphore: asyncio.Semaphore
+    ) -> GuildUpdateResult:
+        """Asks the bot API to update the user in one guild."""
+
+        async with semaphore:
+            try:
+                text, response = await bot_api.request(
+                    "POST",
+                    f"/api/users/{user_id}/update",
+                    route="verification",
+                    body={
+                        "guild_id": guild_id,
+                        "member_id": user_id,
+                        "dm_user": False
+                    },
+                    parse_as="TEXT"
+                )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                logging.error(f"Verification endpoint request failed for guild {guild_id}: {ex!r}")
+                return GuildUpdateResult(guild_id=guild_id, success=False, error=ex.__class__.__name__)
+
+        if response.status != StatusCodes.OK:
+            logging.error(f"Verification endpoint response: {response.status}, {text}")
+
+        return GuildUpdateResult(
+            guild_id=guild_id, success=response.status == StatusCodes.OK, status=response.status
+        )
+
+    @staticmethod
+    def update_result(guild_id: int, update: asyncio.Task) -> GuildUpdateResult:
+        """Returns the result of a guild update, turning a missed deadline or an error into a failure."""
+
+        if not update.done() or update.cancelled():
+            return GuildUpdateResult(guild_id=guild_id, success=False, error="Deadline exceeded")
+
+        if ex := update.exception():
+            logging.error(f"Verification endpoint update failed for guild {guild_id}: {ex!r}")
+            return GuildUpdateResult(guild_id=guild_id, success=False, error=ex.__class__.__name__)
+
+        return update.result()
+
     async def handle(self, request: RedisRelayRequest[Payload]) -> Response:
         payload = request.payload
-        guild_ids = payload.guild_ids
         user_id = payload.user_id
 
-        for guild_id in guild_ids: # TODO: probably unnecessary to handle from relay server. might be better for API -> http bot directly.
-            guild = howblox.get_guild(guild_id)
-
-            if not guild:
-                continue
+        # TODO: probably unnecessary to handle from relay server.
+        # might be better for API -> http bot directly.
+        semaphore = asyncio.Semaphore(CONFIG.VERIFICATION_CONCURRENCY)
+        updates = {
+            guild_id: asyncio.create_task(self.update_guild(guild_id, user_id, semaphore))
+            for guild_id in dict.fromkeys(payload.guild_ids)
+            if howblox.get_guild(guild_id)
+        }
 
-            text, response = await fetch(
-                "POST",
-                f"{CONFIG.HTTP_BOT_API}/api/users/{user_id}/update",
-                headers={"Authorization": CONFIG.HTTP_BOT_AUTH},
-                body={
-                    "guild_id": guild.id,
-                    "member_id": user_id,
-                    "dm_user": False
-                },
-                raise_on_failure=False
-            )
+        if updates:
+            _, pending = await asyncio.wait(updates.values(), timeout=CONFIG.VERIFICATION_DEADLINE)
 
-            if response.status != StatusCodes.OK:
-                logging.error(f"Verification endpoint response: {response.status}, {text}")
+            for update in pending:
+                update.cancel()
 
+        results = [self.update_result(guild_id, update) for guild_id, update in updates.items()]
 
-        return Response(success=True)
\ No newline at end of file
+        return Response(
+            success=all(result.success for result in results), nonce=request.nonce, result=results
+        )
\ No newline at end of file
@@ -1,12 +1,8 @@
-import json
-import asyncio
-import logging
-from datetime import timedelta, datetime
-from howblox_lib import parse_into, BaseModel, create_task_log_exception, StatusCodes, fetch, MemberSerializable
-from howblox_lib.database import redis
-import discord
-from ..config import CONFIG
-from ..base import RelayEndpoint
+from pydantic import Field
+from howblox_lib import BaseModel
+from ..base import RelayEndpoint, RequestPriority
+from ..jobs import verifyall_scheduler
+from ..progress import fetch_progress
 from ..redis import RedisRelayRequest
 from ..howblox import howblox
 from ..types import Response
@@ -17,103 +13,68 @@ class Payload(BaseModel):
 
     guild_id: int
     channel_id: int
-    chunk_limit: int
+    chunk_limit: int = Field(gt=0)
 
-class VerifyAllProgress(BaseModel):
-    """Progress of the /verifyall scan"""
 
-    started_at: datetime
-    ended_at: datetime | None = None
-    members_processed: int
-    total_members: int
-    current_chunk: int
-    total_chunks: int
+class CancelPayload(BaseModel):
+    """Payload for the verifyall cancellation endpoint"""
 
+    nonce: str
 
-async def record_progress(nonce: str, progress: int, total: int, current_chunk: int, total_chunks: int):
-    """Record the progress of the verification."""
 
-    current_progress: dict = json.loads(await redis.get(f"progress:{nonce}")) if await redis.exists(f"progress:{nonce}") else {}
+class ProgressPayload(BaseModel):
+    """Payload for the verifyall progress endpoint"""
 
-    if not current_progress:
-        current_progress = {
-            "started_at": datetime.now(),
-            "members_processed": progress,
-            "total_members": total,
-            "current_chunk": current_chunk,
-            "total_chunks": total_chunks
-        }
-
-    parsed_progress = parse_into(current_progress, VerifyAllProgress)
-    parsed_progress.members_processed = progress + parsed_progress.members_processed if progress + parsed_progress.members_processed < total else total # TODO: investigate actual bug
-    parsed_progress.current_chunk = current_chunk
-    parsed_progress.total_chunks = total_chunks
-
-    if total_chunks == current_chunk and total_chunks != 0:
-        parsed_progress.ended_at = datetime.now()
-
-    await redis.set(f"progress:{nonce}", parsed_progress, expire=timedelta(days=2))
-
-    if await redis.get(f"progress:{nonce}:cancelled"):
-        raise asyncio.CancelledError
+    nonces: list[str]
 
 
 class VerifyAllEndpoint(RelayEndpoint[Payload]):
     """An endpoint for chunking the guild and updating all members."""
 
     def __init__(self):
-        super().__init__("VERIFYALL", Payload)
+        super().__init__("VERIFYALL", Payload, priority=RequestPriority.LOW, sharded=True)
 
-    async def handle_chunks(self, guild: discord.Guild, members: list[discord.Member], chunk_limit: int, nonce: str):
-        """Handle the chunking of the members."""
+    async def handle(self, request: RedisRelayRequest[Payload]) -> Response:
+        payload = request.payload
+        guild = howblox.get_guild(payload.guild_id)
 
-        split_chunk = [members[i : i + chunk_limit] for i in range(0, len(members), chunk_limit)]
+        if not guild:
+            return
 
-        await record_progress(nonce, 0, len(members), 0, len(split_chunk))
+        started = await verifyall_scheduler.submit(
+            guild, request.nonce, payload.channel_id, payload.chunk_limit
+        )
 
-        try:
-            for i, member_chunk in enumerate(split_chunk, 1):
-                logging.debug(f"Sending chunk {i + 1} of {len(split_chunk)} chunks.")
+        if not started:
+            return Response(success=False, nonce=request.nonce, error="This server is already being scanned.")
 
-                text, response = await fetch(
-                    "POST",
-                    f"{CONFIG.HTTP_BOT_API}/api/users/update",
-                    headers={"Authorization": CONFIG.HTTP_BOT_AUTH},
-                    body={
-                        "guild_id": guild.id,
-                        "members": [MemberSerializable.from_discordpy(m).model_dump() for m in member_chunk],
-                        "nonce": nonce
-                    },
-                    parse_as="JSON",
-                    timeout=None,
-                    raise_on_failure=False
-                )
-                logging.debug(f"BOT SERVER RESPONSE: {response.status}, {text}")
+        return Response(success=True, nonce=request.nonce)
 
-                if response.status != StatusCodes.OK:
-                    logging.error(f"Verify endpoint response: {response.status}, {text}")
-                    break
 
-                # Wait 3 seconds before sending the next request.
-                logging.debug("Verify endpoint: sleeping for 3 seconds.")
-                await asyncio.sleep(3)
+class VerifyAllCancelEndpoint(RelayEndpoint[CancelPayload]):
+    """An endpoint for cancelling a running /verifyall scan. Only the node running the scan acts on it."""
 
-                await record_progress(nonce, len(member_chunk), len(members), i, len(split_chunk))
+    def __init__(self):
+        super().__init__("VERIFYALL:CANCEL", CancelPayload)
 
-        except asyncio.CancelledError:
+    async def handle(self, request: RedisRelayRequest[CancelPayload]) -> Response:
+        if not verifyall_scheduler.cancel(request.payload.nonce):
             return
 
-    async def handle(self, request: RedisRelayRequest[Payload]) -> Response:
-        payload = request.payload
-        chunk_limit = payload.chunk_limit
-        nonce = request.nonce
-        guild = howblox.get_guild(payload.guild_id)
+        return Response(success=True, nonce=request.nonce)
 
-        if not guild:
-            return
 
-        members = await guild.chunk()
+class VerifyAllProgressEndpoint(RelayEndpoint[ProgressPayload]):
+    """An endpoint for reading the progress of many /verifyall scans at once.
+
+    Progress is shared through Redis, so every node gives the same answer and callers
+    only need the first reply.
+    """
+
+    def __init__(self):
+        super().__init__("VERIFYALL:PROGRESS", ProgressPayload, priority=RequestPriority.HIGH)
 
-        create_task_log_exception(self.handle_chunks(guild, members, chunk_limit, nonce))
+    async def handle(self, request: RedisRelayRequest[ProgressPayload]) -> Response:
+        progress = await fetch_progress(*request.payload.nonces)
 
-        return Response(success=True, nonce=request.nonce)
\ No newline at end of file
+        return Response(success=True, nonce=request.nonce, result=progress)
\ No newline at end of file
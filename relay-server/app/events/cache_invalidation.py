@@ -0,0 +1,62 @@
+import discord
+from app.howblox import howblox
+from app.guild_snapshots import invalidate_snapshots
+
+
+@howblox.event
+async def on_guild_update(_before: discord.Guild, after: discord.Guild):
+    """Drops the guild snapshot when the guild changes."""
+
+    invalidate_snapshots(after.id, "guild")
+
+
+@howblox.event
+async def on_member_remove(member: discord.Member):
+    """Drops the guild snapshot, which holds the member count, when a member leaves.
+
+    Joins are handled by on_member_join in member_join.py, as a client has one handler per event.
+    """
+
+    invalidate_snapshots(member.guild.id, "guild")
+
+
+@howblox.event
+async def on_guild_role_create(role: discord.Role):
+    """Drops the role snapshot of the role's guild."""
+
+    invalidate_snapshots(role.guild.id, "roles")
+
+
+@howblox.event
+async def on_guild_role_update(_before: discord.Role, after: discord.Role):
+    """Drops the role snapshot of the role's guild."""
+
+    invalidate_snapshots(after.guild.id, "roles")
+
+
+@howblox.event
+async def on_guild_role_delete(role: discord.Role):
+    """Drops the role snapshot of the role's guild."""
+
+    invalidate_snapshots(role.guild.id, "roles")
+
+
+@howblox.event
+async def on_guild_channel_create(channel: discord.abc.GuildChannel):
+    """Drops the channel snapshot of the channel's guild."""
+
+    invalidate_snapshots(channel.guild.id, "channels")
+
+
+@howblox.event
+async def on_guild_channel_update(_before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+    """Drops the channel snapshot of the channel's guild."""
+
+    invalidate_snapshots(after.guild.id, "channels")
+
+
+@howblox.event
+async def on_guild_channel_delete(channel: discord.abc.GuildChannel):
+    """Drops the channel snapshot of the channel's guild."""
+
+    invalidate_snapshots(channel.guild.id, "channels")
\ No newline at end of file
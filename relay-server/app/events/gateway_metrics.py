@@ -0,0 +1,58 @@
+import math
+from app.howblox import howblox
+from app.metrics import GATEWAY_EVENTS, Gauge, registry
+
+
+def shard_latencies():
+    """Reads the heartbeat latency of every shard of this node that has a heartbeat yet."""
+
+    return [((str(shard_id),), latency) for shard_id, latency in howblox.latencies if math.isfinite(latency)]
+
+
+registry.register(Gauge(
+    "discord_gateway_latency_seconds",
+    "Heartbeat latency of each shard.",
+    ("shard",),
+    callback=shard_latencies,
+))
+
+
+def count_shard_events(shard_id: int):
+    """Counts the gateway events of a shard's current connection by shard and type.
+
+    discord.py dispatches socket_event_type without the shard, so the dispatcher of the
+    shard's websocket is wrapped instead. Each new connection gets wrapped when it comes
+    up; the few events received before that (HELLO, READY) are not counted.
+    """
+
+    shard = howblox.get_shard(shard_id)
+    ws = shard and shard._parent.ws  # pylint: disable=protected-access
+
+    if not ws or getattr(ws._dispatch, "counts_events", False):  # pylint: disable=protected-access
+        return
+
+    dispatch = ws._dispatch  # pylint: disable=protected-access
+    label = str(shard_id)
+
+    def count_and_dispatch(event: str, *args):
+        if event == "socket_event_type":
+            GATEWAY_EVENTS.inc(label, args[0])
+
+        dispatch(event, *args)
+
+    count_and_dispatch.counts_events = True
+    ws._dispatch = count_and_dispatch  # pylint: disable=protected-access
+
+
+@howblox.event
+async def on_shard_connect(shard_id: int):
+    """Starts counting the events of a shard's new connection."""
+
+    count_shard_events(shard_id)
+
+
+@howblox.event
+async def on_shard_resumed(shard_id: int):
+    """Starts counting the events of a shard's resumed connection."""
+
+    count_shard_events(shard_id)
\ No newline at end of file
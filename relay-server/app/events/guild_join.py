@@ -1,9 +1,7 @@
-import logging
 import discord
-from howblox_lib import fetch_typed, StatusCodes
-from howblox_lib.database import update_guild_data
 from app.howblox import howblox
-from app.types import PremiumResponse
+from app.guild_settings import update_guild_settings
+from app.premium import get_guild_premium
 from app.config import CONFIG
 
 
@@ -12,19 +10,10 @@ from app.config import CONFIG
 async def on_guild_join(guild: discord.Guild):
     """Event for when the bot joins a guild."""
 
-    await update_guild_data(guild.id, hasBot=True)
+    await update_guild_settings(guild.id, hasBot=True)
 
     if CONFIG.BOT_RELEASE == "PRO":
-        json_response, response = await fetch_typed(
-            PremiumResponse,
-            f"{CONFIG.HTTP_BOT_API}/api/premium/guilds/{guild.id}",
-            headers={"Authorization": CONFIG.HTTP_BOT_AUTH},
-        )
+        premium_status = await get_guild_premium(guild.id)
 
-        if json_response.premium and "pro" in json_response.features:
-            await update_guild_data(guild.id, proBot=True)
-
-        logging.debug(f"[Guild join] premium check response: {response.status}, {json_response}")
-
-        if response.status != StatusCodes.OK:
-            logging.error(f"[Guild join] premium check error: {response.status}, {json_response}")
\ No newline at end of file
+        if premium_status.premium and "pro" in premium_status.features:
+            await update_guild_settings(guild.id, proBot=True)
\ No newline at end of file
@@ -1,6 +1,8 @@
 import discord
-from howblox_lib.database import update_guild_data
 from app.howblox import howblox
+from app.guild_settings import update_guild_settings
+from app.guild_snapshots import invalidate_snapshots
+from app.jobs import verifyall_scheduler
 from app.config import CONFIG
 
 
@@ -8,5 +10,8 @@ from app.config import CONFIG
 async def on_guild_remove(guild: discord.Guild):
     """Event for when the bot leaves a guild."""
 
+    invalidate_snapshots(guild.id)
+    await verifyall_scheduler.drop_guild(guild.id)
+
     if CONFIG.BOT_RELEASE == "PRO":
-        await update_guild_data(guild.id, proBot=False)
\ No newline at end of file
+        await update_guild_settings(guild.id, proBot=False)
\ No newline at end of file
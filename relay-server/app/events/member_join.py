@@ -1,28 +1,22 @@
-import logging
-from howblox_lib import fetch, StatusCodes, MemberSerializable
-from howblox_lib.database import fetch_guild_data
 from discord import Member
 from app.howblox import howblox
-from app.config import CONFIG
+from app.guild_settings import get_guild_settings
+from app.guild_snapshots import invalidate_snapshots
+from app.join_batcher import member_join_batcher
 
 
 @howblox.event
 async def on_member_join(member: Member):
     """Event for when a member joins a guild."""
 
-    guild_data = await fetch_guild_data(member.guild.id, "autoRoles", "autoVerification", "highTrafficServer")
+    # The guild snapshot holds the member count.
+    invalidate_snapshots(member.guild.id, "guild")
 
-    if (guild_data.autoRoles or guild_data.autoVerification) and not guild_data.highTrafficServer:
-        json_response, response = await fetch(
-            "POST",
-            f"{CONFIG.HTTP_BOT_API}/api/users/{member.id}/{member.guild.id}/join",
-            headers={"Authorization": CONFIG.HTTP_BOT_AUTH},
-            body={
-                "member": MemberSerializable.from_discordpy(member).model_dump()
-            },
-            parse_as="JSON"
-        )
-        logging.debug(f"Relay server member join response: {response.status}, {json_response}")
+    guild_data = await get_guild_settings(member.guild.id, "autoRoles", "autoVerification", "highTrafficServer")
 
-        if response.status != StatusCodes.OK:
-            logging.error(f"Relay server member join error: {response.status}, {json_response}")
\ No newline at end of file
+    # High traffic servers are only forwarded once joins go out through the bulk route.
+    if not (guild_data.autoRoles or guild_data.autoVerification):
+        return
+
+    if member_join_batcher.bulk or not guild_data.highTrafficServer:
+        member_join_batcher.add(member)
\ No newline at end of file
@@ -1,9 +1,9 @@
 import asyncio
 from howblox_lib import get_accounts, reverse_lookup
-from howblox_lib.database import fetch_guild_data
 from discord import User, Member, Guild, NotFound, Object
 from app.howblox import howblox
 from app.decorators import guild_premium_required
+from app.guild_settings import get_guild_settings
 
 
 @howblox.event
@@ -11,7 +11,7 @@ from app.decorators import guild_premium_required
 async def on_member_unban(guild: Guild, user: User | Member):
     """Event for when a user is unbanned from the guild."""
 
-    guild_data = await fetch_guild_data(guild.id, "unbanRelatedAccounts")
+    guild_data = await get_guild_settings(guild.id, "unbanRelatedAccounts")
 
     if guild_data.unbanRelatedAccounts:
         roblox_accounts = await get_accounts(user)
@@ -1,7 +1,10 @@
 import logging
+from howblox_lib import create_task_log_exception
 from app.howblox import howblox
+from app.jobs import verifyall_scheduler
 
 @howblox.event
 async def on_ready():
-    """Log when the bot is ready."""
-    logging.info(f"Logged in as {howblox.user.name}")
\ No newline at end of file
+    """Log when the bot is ready and resume the verifyall jobs of its guilds."""
+    logging.info(f"Logged in as {howblox.user.name}")
+    create_task_log_exception(verifyall_scheduler.resume())
\ No newline at end of file
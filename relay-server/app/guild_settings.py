@@ -0,0 +1,59 @@
+"""
+A per-node cache of guild settings.
+
+Cached settings are dropped on every node when a message is published to
+INVALIDATE:GUILD_SETTINGS. Every writer of guild settings must publish one after
+writing, {"data": {"guild_id": <guild id>}} for one guild or {"data": {}} for all.
+The relay does so through update_guild_settings. Writers outside the relay (the API
+and the dashboard) do not publish yet, so their changes show up once the cached entry
+expires after GUILD_SETTINGS_CACHE_TTL, which is kept short until they do.
+"""
+import json
+from typing import Any
+from howblox_lib.database import fetch_guild_data, update_guild_data, redis
+from .cache import TTLCache
+from .config import CONFIG
+
+
+GUILD_SETTINGS_INVALIDATION_CHANNEL = "INVALIDATE:GUILD_SETTINGS"
+
+guild_settings_cache: TTLCache[tuple[int, tuple[str, ...]], Any] = TTLCache(
+    max_size=CONFIG.GUILD_SETTINGS_CACHE_MAX_SIZE, ttl=CONFIG.GUILD_SETTINGS_CACHE_TTL
+)
+
+
+async def get_guild_settings(guild_id: int, *fields: str) -> Any:
+    """Fetches guild settings through the local cache.
+
+    Entries are keyed by guild and field set. The returned object is shared between
+    callers and must not be mutated.
+    """
+
+    return await guild_settings_cache.get_or_load(
+        (guild_id, tuple(sorted(fields))), lambda: fetch_guild_data(guild_id, *fields)
+    )
+
+
+def invalidate_guild_settings(guild_id: int | None = None):
+    """Drops the cached settings of a guild, or of every guild if none is given."""
+
+    if guild_id is None:
+        guild_settings_cache.clear()
+    else:
+        guild_settings_cache.invalidate_where(lambda key: key[0] == guild_id)
+
+
+async def publish_guild_settings_invalidation(guild_id: int | None = None):
+    """Invalidates the cached settings of a guild, or of every guild, on every node."""
+
+    data = {} if guild_id is None else {"guild_id": guild_id}
+
+    invalidate_guild_settings(guild_id)
+    await redis.publish(GUILD_SETTINGS_INVALIDATION_CHANNEL, json.dumps({"data": data}))
+
+
+async def update_guild_settings(guild_id: int, **settings):
+    """Writes guild settings and invalidates them on every node."""
+
+    await update_guild_data(guild_id, **settings)
+    await publish_guild_settings_invalidation(guild_id)
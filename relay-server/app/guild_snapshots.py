@@ -0,0 +1,39 @@
+"""
+Per-guild snapshots of serialized cache lookup results.
+
+The cache lookup endpoint serializes a guild's data, roles or channels once and serves
+the stored JSON until a gateway event changes them. Each lookup type is cached and
+invalidated on its own, so a role update keeps the guild's channel snapshot.
+"""
+from typing import Callable, Literal
+from .cache import TTLCache
+from .config import CONFIG
+from .publisher import RawJSON
+
+
+SnapshotType = Literal["guild", "roles", "channels"]
+SNAPSHOT_TYPES: tuple[SnapshotType, ...] = ("guild", "roles", "channels")
+
+guild_snapshot_cache: TTLCache[tuple[int, SnapshotType], RawJSON] = TTLCache(
+    max_size=CONFIG.GUILD_SNAPSHOT_CACHE_MAX_SIZE, ttl=CONFIG.GUILD_SNAPSHOT_CACHE_TTL
+)
+
+
+def get_snapshot(guild_id: int, snapshot_type: SnapshotType, build: Callable[[], RawJSON]) -> RawJSON:
+    """Returns the serialized snapshot of a guild, building and storing it on a miss."""
+
+    key = (guild_id, snapshot_type)
+    snapshot = guild_snapshot_cache.get(key)
+
+    if snapshot is None:
+        snapshot = build()
+        guild_snapshot_cache.set(key, snapshot)
+
+    return snapshot
+
+
+def invalidate_snapshots(guild_id: int, *snapshot_types: SnapshotType):
+    """Drops the given snapshots of a guild, or all of them if no type is given."""
+
+    for snapshot_type in snapshot_types or SNAPSHOT_TYPES:
+        guild_snapshot_cache.invalidate((guild_id, snapshot_type))
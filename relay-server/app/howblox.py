@@ -12,7 +12,9 @@ class Howblox(discord.AutoShardedClient):
     def __init__(self, **kwargs):
         self.started_at = time()
         super().__init__(
-            intents=self.intents,
+            intents=self._intents,
+            member_cache_flags=self._member_cache_flags,
+            max_messages=None if self.lean_cache else 1000,
             chunk_guilds_at_startup=False,
             shard_count=CONFIG.SHARD_COUNT,
             shard_ids=self._shard_ids,
@@ -23,16 +25,39 @@ class Howblox(discord.AutoShardedClient):
             **kwargs
         )
     
+    @property
+    def lean_cache(self) -> bool:
+        """Whether the client caches only what the relay reads."""
+
+        return CONFIG.GATEWAY_CACHE_MODE == "lean"
+
     @property
     def _intents(self) -> discord.Intents:
-        """Get the intents for the bot."""
+        """Get the intents for the bot.
 
-        intents = discord.Intents.default()
+        The lean cache leaves out the other default intents (messages, reactions, voice and
+        so on), whose events the relay never handles, so their objects are never cached.
+        """
+
+        intents = discord.Intents.none() if self.lean_cache else discord.Intents.default()
 
         for intent in ("guilds", "members", "bans"):
             setattr(intents, intent, True)
 
         return intents
+
+    @property
+    def _member_cache_flags(self) -> discord.MemberCacheFlags:
+        """Get which members are cached.
+
+        The lean cache keeps no members from gateway events; members only enter the cache
+        while a guild is chunked for /verifyall, and are evicted when the scan ends.
+        """
+
+        if self.lean_cache:
+            return discord.MemberCacheFlags.none()
+
+        return discord.MemberCacheFlags.from_intents(self._intents)
     
     @property
     def node_id(self):
@@ -0,0 +1,392 @@
+"""
+Durable /verifyall jobs.
+
+Each job is a Redis hash at verifyall:job:{nonce} holding its request and a checkpoint:
+the number of chunks settled in order and the ID of the last member they covered. A chunk
+is settled once it was delivered or given up on, so one failed chunk does not hold the
+checkpoint back; given-up chunks are counted in chunks_failed.
+Unfinished jobs are listed in the verifyall:jobs set, so a node that restarts (or any
+node that picks up the guild's shard) resumes them from the checkpoint. Records expire
+after VERIFYALL_JOB_TTL without progress, and index entries whose record expired, or
+whose guild the bot left, are pruned.
+
+A guild is only ever scanned by one job at a time, enforced with a lock at
+verifyall:lock:{guild_id} that the owning node keeps renewing while the job runs.
+"""
+import math
+import asyncio
+import logging
+from howblox_lib import BaseModel, MemberSerializable
+from howblox_lib.database import redis
+import discord
+from .base import shard_for_guild
+from .bot_api import bot_api
+from .chunk_dispatcher import ChunkDispatcher, create_rate_limiter, node_scheduler
+from .config import CONFIG
+from .howblox import howblox
+from .member_source import iter_member_batches
+from .progress import start_progress, queue_progress, finish_progress
+
+
+JOB_INDEX_KEY = "verifyall:jobs"
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+RENEW_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class VerifyAllJobRecord(BaseModel):
+    """The persisted state of a /verifyall job."""
+
+    nonce: str
+    guild_id: int
+    channel_id: int
+    chunk_limit: int
+    chunks_done: int = 0
+    chunks_failed: int = 0
+    cursor: int | None = None
+
+
+def job_key(nonce: str) -> str:
+    """Returns the Redis key holding a job record."""
+
+    return f"verifyall:job:{nonce}"
+
+
+def lock_key(guild_id: int) -> str:
+    """Returns the Redis key of a guild's scan lock."""
+
+    return f"verifyall:lock:{guild_id}"
+
+
+def lock_owner(nonce: str) -> str:
+    """Returns the lock value identifying a job on this node."""
+
+    return f"{howblox.node_id}:{nonce}"
+
+
+class VerifyAllJob:
+    """Runs one /verifyall job, checkpointing it as chunks are delivered."""
+
+    def __init__(self, record: VerifyAllJobRecord, guild: discord.Guild):
+        self.record = record
+        self.guild = guild
+        self.cancelled = False
+
+        # Chunks of this run settled out of order, by index, mapped to their last member ID.
+        self._settled: dict[int, int] = {}
+        self._contiguous = 0
+        self._resumed_from = record.chunks_done
+
+    async def send_chunk(self, member_chunk: tuple[discord.Member, ...]) -> int:
+        """Posts a chunk of members to the bot API."""
+
+        text, response = await bot_api.send_member_batch(
+            "/api/users/update",
+            route="verifyall",
+            guild_id=self.guild.id,
+            members=[MemberSerializable.from_discordpy(m).model_dump() for m in member_chunk],
+            nonce=self.record.nonce,
+        )
+        logging.debug(f"BOT SERVER RESPONSE: {response.status}, {text}")
+
+        return response.status
+
+    async def chunk_sent(self, index: int, member_chunk: tuple[discord.Member, ...]):
+        """Counts a delivered chunk and moves the checkpoint past it."""
+
+        await self._settle(index, member_chunk)
+        logging.debug(f"Sent chunk {self._resumed_from + index} of verifyall {self.record.nonce}.")
+
+    async def chunk_failed(self, index: int, member_chunk: tuple[discord.Member, ...]):
+        """Counts a chunk that was given up on and moves the checkpoint past it all the same."""
+
+        await self._settle(index, member_chunk, failed=True)
+
+    async def _settle(self, index: int, member_chunk: tuple[discord.Member, ...], *, failed: bool = False):
+        """Moves the checkpoint past every chunk settled in order and saves it with the progress."""
+
+        record = self.record
+        self._settled[index] = member_chunk[-1].id
+
+        if failed:
+            record.chunks_failed += 1
+
+        while self._contiguous + 1 in self._settled:
+            self._contiguous += 1
+            record.cursor = self._settled.pop(self._contiguous)
+
+        record.chunks_done = self._resumed_from + self._contiguous
+        checkpoint = {"chunks_done": record.chunks_done, "chunks_failed": record.chunks_failed}
+
+        if record.cursor is not None:
+            checkpoint["cursor"] = record.cursor
+
+        async with redis.pipeline(transaction=True) as pipeline:
+            queue_progress(pipeline, record.nonce, len(member_chunk), failed=failed)
+            pipeline.hset(job_key(record.nonce), mapping=checkpoint)
+            pipeline.expire(job_key(record.nonce), int(CONFIG.VERIFYALL_JOB_TTL))
+            await pipeline.execute()
+
+    async def run(self) -> list[int]:
+        """Sends every member after the checkpoint. Returns the chunks that were given up on."""
+
+        guild_max_rate = CONFIG.VERIFYALL_GUILD_MAX_RATES.get(self.guild.id, CONFIG.VERIFYALL_MAX_RATE)
+        dispatcher = ChunkDispatcher(
+            self.send_chunk,
+            (create_rate_limiter(guild_max_rate), node_scheduler.for_job(self.record.nonce)),
+            window_size=CONFIG.VERIFYALL_WINDOW_SIZE,
+            max_retries=CONFIG.VERIFYALL_MAX_RETRIES,
+            retry_delay=CONFIG.VERIFYALL_RETRY_DELAY,
+        )
+
+        await dispatcher.run(
+            iter_member_batches(
+                self.guild,
+                self.record.chunk_limit,
+                CONFIG.VERIFYALL_MEMBER_SOURCE,
+                after=self.record.cursor,
+                evict=CONFIG.GATEWAY_CACHE_MODE == "lean",
+            ),
+            self.chunk_sent,
+            self.chunk_failed,
+        )
+
+        return dispatcher.failed_chunks
+
+
+class VerifyAllScheduler:
+    """Runs the /verifyall jobs of this node, at most max_jobs of them at a time."""
+
+    def __init__(self, max_jobs: int, lock_ttl: float):
+        self.lock_ttl = lock_ttl
+
+        self.jobs: dict[str, VerifyAllJob] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._slots = asyncio.Semaphore(max_jobs)
+
+    async def submit(self, guild: discord.Guild, nonce: str, channel_id: int, chunk_limit: int) -> bool:
+        """Creates a job and starts it. Returns False if the guild is already being scanned.
+
+        Nothing is locked or persisted for a request that cannot be started, and a failure
+        while creating the job releases the lock and deletes the record again.
+        """
+
+        if chunk_limit < 1:
+            raise ValueError(f"chunk_limit must be at least 1, got {chunk_limit}")
+
+        record = VerifyAllJobRecord(
+            nonce=nonce, guild_id=guild.id, channel_id=channel_id, chunk_limit=chunk_limit
+        )
+        total_members = guild.member_count or 0
+        total_chunks = math.ceil(total_members / chunk_limit)
+
+        if not await self._acquire_lock(guild.id, nonce):
+            return False
+
+        try:
+            async with redis.pipeline(transaction=True) as pipeline:
+                pipeline.hset(job_key(nonce), mapping=record.model_dump(exclude_none=True))
+                pipeline.expire(job_key(nonce), int(CONFIG.VERIFYALL_JOB_TTL))
+                pipeline.sadd(JOB_INDEX_KEY, nonce)
+                await pipeline.execute()
+
+            await start_progress(nonce, total_members, total_chunks)
+
+        except BaseException:
+            async with redis.pipeline(transaction=True) as pipeline:
+                pipeline.delete(job_key(nonce))
+                pipeline.srem(JOB_INDEX_KEY, nonce)
+                await pipeline.execute()
+
+            await self._release_lock(guild.id, nonce)
+            raise
+
+        self._start(VerifyAllJob(record, guild))
+
+        return True
+
+    async def resume(self):
+        """Resumes the unfinished jobs of guilds on this node that no other node holds.
+
+        Jobs of guilds on this node's shards that the bot is no longer in are dropped.
+        """
+
+        shard_ids = howblox.shard_ids or (0,)
+
+        for nonce in await redis.smembers(JOB_INDEX_KEY):
+            if nonce in self.jobs:
+                continue
+
+            record = await self._load(nonce)
+
+            if not record:
+                continue
+
+            guild = howblox.get_guild(record.guild_id)
+
+            if not guild:
+                if shard_for_guild(record.guild_id) in shard_ids:
+                    logging.info(f"Dropping verifyall {nonce}, the bot left {record.guild_id}.")
+                    await self._finish(record, cancelled=True)
+
+                continue
+
+            if not await self._acquire_lock(guild.id, nonce):
+                continue
+
+            logging.info(f"Resuming verifyall {nonce} of {guild.id} after chunk {record.chunks_done}.")
+            self._start(VerifyAllJob(record, guild))
+
+    async def drop_guild(self, guild_id: int):
+        """Cancels and forgets every job of a guild the bot left."""
+
+        for nonce in await redis.smembers(JOB_INDEX_KEY):
+            if nonce in self.jobs:
+                if self.jobs[nonce].record.guild_id == guild_id:
+                    self.cancel(nonce)
+
+                continue
+
+            record = await self._load(nonce)
+
+            if record and record.guild_id == guild_id:
+                await self._finish(record, cancelled=True)
+
+    async def _load(self, nonce: str) -> VerifyAllJobRecord | None:
+        """Reads a job record, pruning its index entry if the record expired."""
+
+        data = await redis.hgetall(job_key(nonce))
+
+        if not data:
+            await redis.srem(JOB_INDEX_KEY, nonce)
+            return None
+
+        return VerifyAllJobRecord.model_validate(data)
+
+    def cancel(self, nonce: str) -> bool:
+        """Cancels a job running on this node. Returns False if there is none."""
+
+        task = self._tasks.get(nonce)
+
+        if not task:
+            return False
+
+        self.jobs[nonce].cancelled = True
+        task.cancel()
+
+        return True
+
+    def _start(self, job: VerifyAllJob):
+        """Runs a job in the background."""
+
+        nonce = job.record.nonce
+        task = asyncio.create_task(self._run(job))
+
+        self.jobs[nonce] = job
+        self._tasks[nonce] = task
+        task.add_done_callback(lambda _: self._forget(nonce))
+
+    def _forget(self, nonce: str):
+        """Drops a job that stopped running on this node."""
+
+        self.jobs.pop(nonce, None)
+        self._tasks.pop(nonce, None)
+
+    async def _run(self, job: VerifyAllJob):
+        """Runs a job once a slot is free, holding the guild's lock throughout."""
+
+        record = job.record
+        renewer = asyncio.create_task(self._renew_lock(asyncio.current_task(), record.guild_id, record.nonce))
+
+        try:
+            async with self._slots:
+                failed_chunks = await job.run()
+
+        except asyncio.CancelledError:
+            if job.cancelled:
+                logging.info(f"Verifyall {record.nonce} of {record.guild_id} was cancelled.")
+                await self._finish(record, cancelled=True)
+            else:
+                # Shutting down or lost the lock: keep the record so the job is resumed.
+                await self._release_lock(record.guild_id, record.nonce)
+
+            raise
+
+        except Exception as ex: # pylint: disable=broad-except
+            logging.error(f"Verifyall {record.nonce} of {record.guild_id} failed: {ex!r}")
+            await self._finish(record)
+            return
+
+        finally:
+            renewer.cancel()
+
+        if failed_chunks:
+            logging.error(f"Verifyall {record.nonce} gave up on chunks {failed_chunks} of {record.guild_id}.")
+
+        await self._finish(record)
+
+    async def _finish(self, record: VerifyAllJobRecord, *, cancelled: bool = False):
+        """Marks a job as ended and deletes its record and lock."""
+
+        # member_count is approximate, so the scan may not end on the expected chunk.
+        await finish_progress(record.nonce, cancelled=cancelled)
+
+        async with redis.pipeline(transaction=True) as pipeline:
+            pipeline.delete(job_key(record.nonce))
+            pipeline.srem(JOB_INDEX_KEY, record.nonce)
+            await pipeline.execute()
+
+        await self._release_lock(record.guild_id, record.nonce)
+
+    async def _acquire_lock(self, guild_id: int, nonce: str) -> bool:
+        """Takes a guild's scan lock for a job, or takes back one this node held before restarting."""
+
+        if await redis.set(lock_key(guild_id), lock_owner(nonce), nx=True, px=int(self.lock_ttl * 1000)):
+            return True
+
+        return await self._renew(guild_id, nonce)
+
+    async def _renew(self, guild_id: int, nonce: str) -> bool:
+        """Extends a guild's scan lock if the job holds it."""
+
+        ttl = int(self.lock_ttl * 1000)
+
+        return await redis.eval(RENEW_LOCK_SCRIPT, 1, lock_key(guild_id), lock_owner(nonce), ttl) == 1
+
+    async def _release_lock(self, guild_id: int, nonce: str):
+        """Releases a guild's scan lock if the job still holds it."""
+
+        await redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key(guild_id), lock_owner(nonce))
+
+    async def _renew_lock(self, job_task: asyncio.Task, guild_id: int, nonce: str):
+        """Keeps a job's lock alive, stopping the job if the lock was lost to another node."""
+
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+
+            try:
+                renewed = await self._renew(guild_id, nonce)
+            except Exception as ex: # pylint: disable=broad-except
+                logging.warning(f"Could not renew the verifyall lock of {guild_id}: {ex!r}")
+                continue
+
+            if not renewed:
+                logging.error(f"Verifyall {nonce} lost the lock of {guild_id}, stopping it.")
+                job_task.cancel()
+                return
+
+
+verifyall_scheduler = VerifyAllScheduler(
+    max_jobs=CONFIG.VERIFYALL_MAX_CONCURRENT_JOBS, lock_ttl=CONFIG.VERIFYALL_LOCK_TTL
+)
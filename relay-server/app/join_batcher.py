@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from http import HTTPStatus
+import discord
+from howblox_lib import StatusCodes, MemberSerializable, create_task_log_exception
+from .bot_api import bot_api
+from .config import CONFIG
+
+
+class MemberJoinBatcher:
+    """Buffers member joins per guild and forwards them to the bot API in bulk.
+
+    A guild's joins are sent as one request once the batch window has elapsed or the
+    batch is full, whichever comes first, so raids cost one request per batch instead
+    of one per member.
+
+    Joins are only batched with bulk set, for bot APIs that provide the bulk join route.
+    Without it each join is posted to the per-member join route as soon as it arrives, and
+    once the bot API answers the bulk route with 404 any batch already buffered is posted
+    member by member the same way.
+    """
+
+    def __init__(self, window: float, max_batch_size: int, *, bulk: bool = False):
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.bulk = bulk
+
+        self._pending: dict[int, dict[int, discord.Member]] = {}
+        self._flush_tasks: dict[int, asyncio.Task] = {}
+
+    def add(self, member: discord.Member):
+        """Queues a member join to be forwarded with the rest of its guild's batch.
+
+        Without the bulk route there is nothing to batch, so the join is forwarded right away.
+        """
+
+        if not self.bulk:
+            create_task_log_exception(self._send_member(member))
+            return
+
+        guild_id = member.guild.id
+        batch = self._pending.setdefault(guild_id, {})
+        batch[member.id] = member
+
+        if len(batch) >= self.max_batch_size:
+            self._flush(guild_id)
+        elif guild_id not in self._flush_tasks:
+            self._flush_tasks[guild_id] = create_task_log_exception(self._flush_later(guild_id))
+
+    async def _flush_later(self, guild_id: int):
+        """Flushes a guild's batch once the batch window has elapsed."""
+
+        await asyncio.sleep(self.window)
+
+        self._flush_tasks.pop(guild_id, None)
+        self._flush(guild_id)
+
+    def _flush(self, guild_id: int):
+        """Takes a guild's pending joins and sends them in the background."""
+
+        members = self._pending.pop(guild_id, None)
+
+        if flush_task := self._flush_tasks.pop(guild_id, None):
+            flush_task.cancel()
+
+        if members:
+            create_task_log_exception(self._send(guild_id, list(members.values())))
+
+    async def _send(self, guild_id: int, members: list[discord.Member]):
+        """Forwards a batch of joins to the bot API."""
+
+        if self.bulk:
+            json_response, response = await bot_api.send_member_batch(
+                "/api/users/join",
+                route="member_join",
+                guild_id=guild_id,
+                members=[MemberSerializable.from_discordpy(member).model_dump() for member in members],
+            )
+
+            if response.status not in (HTTPStatus.NOT_FOUND, HTTPStatus.METHOD_NOT_ALLOWED):
+                self._log_response(len(members), json_response, response.status)
+                return
+
+            logging.warning("The bot API has no bulk member join route, falling back to per-member joins.")
+            self.bulk = False
+
+        await asyncio.gather(*(self._send_member(member) for member in members))
+
+    async def _send_member(self, member: discord.Member):
+        """Forwards a single join to the per-member join route."""
+
+        json_response, response = await bot_api.request(
+            "POST",
+            f"/api/users/{member.id}/{member.guild.id}/join",
+            route="member_join",
+            body={
+                "member": MemberSerializable.from_discordpy(member).model_dump()
+            },
+        )
+        self._log_response(1, json_response, response.status)
+
+    @staticmethod
+    def _log_response(member_count: int, json_response, status: int):
+        """Logs the bot API's answer to forwarded joins."""
+
+        logging.debug(
+            f"Relay server member join response for {member_count} members: {status}, {json_response}"
+        )
+
+        if status != StatusCodes.OK:
+            logging.error(f"Relay server member join error: {status}, {json_response}")
+
+
+member_join_batcher = MemberJoinBatcher(
+    window=CONFIG.MEMBER_JOIN_BATCH_WINDOW,
+    max_batch_size=CONFIG.MEMBER_JOIN_BATCH_SIZE,
+    bulk=CONFIG.MEMBER_JOIN_BULK_ROUTE,
+)
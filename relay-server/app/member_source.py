@@ -0,0 +1,80 @@
+from typing import AsyncIterator, Literal
+import discord
+
+
+MemberSource = Literal["cache", "pages"]
+
+
+def evict_members(guild: discord.Guild):
+    """Drops a guild's members from the cache, keeping the bot's own member."""
+
+    me = guild.me
+    guild._members.clear()  # pylint: disable=protected-access
+
+    if me:
+        guild._add_member(me)  # pylint: disable=protected-access
+
+
+async def iter_member_batches(
+    guild: discord.Guild,
+    batch_size: int,
+    source: MemberSource = "cache",
+    *,
+    after: int | None = None,
+    evict: bool = False,
+) -> AsyncIterator[tuple[discord.Member, ...]]:
+    """Lazily yields the members of a guild in batches of up to batch_size, ordered by ID.
+
+    With the "cache" source the guild is chunked into the member cache if it is not
+    already, then batched off the cached members. Ordering them takes one list of
+    references to the cached member IDs (8 bytes each, next to the members themselves),
+    which shrinks as batches are taken off it. With the "pages" source, members are
+    read from the paginated member list endpoint and never enter the cache, so only the
+    batch being built and the page being read are held in memory.
+
+    Only members with an ID greater than after are yielded, which lets a scan resume
+    from the last member it checkpointed. With evict, a guild chunked only for this scan
+    has its members dropped from the cache again once the scan ends.
+    """
+
+    if source == "cache":
+        chunked_here = not guild.chunked
+
+        if chunked_here:
+            await guild.chunk()
+
+        try:
+            # Sort the cache's own ID keys (no copy of Guild.members, no key list), descending
+            # so batches are taken off the end and the list is freed as it shrinks.
+            cached = guild._members  # pylint: disable=protected-access
+            member_ids = [member_id for member_id in cached if after is None or member_id > after]
+            member_ids.sort(reverse=True)
+
+            while member_ids:
+                # Members that left since the scan started are skipped.
+                batch = tuple(
+                    member for member_id in reversed(member_ids[-batch_size:])
+                    if (member := cached.get(member_id))
+                )
+                del member_ids[-batch_size:]
+
+                if batch:
+                    yield batch
+
+        finally:
+            if evict and chunked_here:
+                evict_members(guild)
+
+        return
+
+    batch: list[discord.Member] = []
+
+    async for member in guild.fetch_members(limit=None, after=discord.Object(after or 0)):
+        batch.append(member)
+
+        if len(batch) >= batch_size:
+            yield tuple(batch)
+            batch = []
+
+    if batch:
+        yield tuple(batch)
@@ -0,0 +1,157 @@
+"""
+Approximate accounting of the memory the gateway cache holds per guild.
+
+Sizes are estimated from sys.getsizeof of each cached object and of the plain values
+in its slots. Large collections are estimated from a sample of their first objects.
+Walking thousands of guilds still takes seconds, so the accounting runs in the
+background, yielding to the event loop between guilds, and the stats endpoint serves
+the last snapshot.
+"""
+import sys
+import time
+import heapq
+import asyncio
+from array import array
+from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Collection, Iterable
+import discord
+from howblox_lib import BaseModel, create_task_log_exception
+from .config import CONFIG
+from .howblox import howblox
+
+
+PLAIN_TYPES = (str, bytes, int, float, tuple, list, dict, set, frozenset, array, datetime)
+
+
+class GuildMemory(BaseModel):
+    """The cached objects of a guild and their estimated size."""
+
+    guild_id: int
+    members: int
+    roles: int
+    channels: int
+    emojis: int
+    estimated_bytes: int
+
+
+class CacheMemory(BaseModel):
+    """The gateway cache of a node: its mode, totals and largest guilds."""
+
+    mode: str
+    measured_at: float
+    members: int
+    estimated_bytes: int
+    largest_guilds: list[GuildMemory]
+
+
+def shallow_size(obj: Any) -> int:
+    """Estimates the size of an object and the plain values in its slots.
+
+    Other discord objects it references, such as its guild, are left out.
+    """
+
+    size = sys.getsizeof(obj)
+
+    for cls in type(obj).__mro__:
+        slots = getattr(cls, "__slots__", ())
+
+        for name in (slots,) if isinstance(slots, str) else slots:
+            value = getattr(obj, name, None)
+
+            if isinstance(value, PLAIN_TYPES):
+                size += sys.getsizeof(value)
+
+    return size
+
+
+def member_size(member: discord.Member) -> int:
+    """Estimates the size of a member and the user it wraps."""
+
+    return shallow_size(member) + shallow_size(member._user)  # pylint: disable=protected-access
+
+
+def sampled_size(objects: Collection, size: Callable[[Any], int], sample_size: int) -> int:
+    """Estimates the total size of a collection from the average size of its first objects."""
+
+    if not objects:
+        return 0
+
+    sample = list(islice(objects, sample_size))
+
+    return round(sum(map(size, sample)) / len(sample) * len(objects))
+
+
+def guild_memory(guild: discord.Guild, sample_size: int) -> GuildMemory:
+    """Accounts for the cached objects of a guild."""
+
+    members = guild._members.values()  # pylint: disable=protected-access
+    roles = guild._roles.values()  # pylint: disable=protected-access
+    channels = guild._channels.values()  # pylint: disable=protected-access
+    emojis = guild.emojis
+
+    return GuildMemory(
+        guild_id=guild.id,
+        members=len(members),
+        roles=len(roles),
+        channels=len(channels),
+        emojis=len(emojis),
+        estimated_bytes=shallow_size(guild)
+        + sampled_size(members, member_size, sample_size)
+        + sampled_size(roles, shallow_size, sample_size)
+        + sampled_size(channels, shallow_size, sample_size)
+        + sampled_size(emojis, shallow_size, sample_size),
+    )
+
+
+async def measure_cache(
+    guilds: Iterable[discord.Guild], mode: str, sample_size: int, top: int
+) -> CacheMemory:
+    """Accounts for every cached guild, listing the top guilds holding the most memory.
+
+    Yields to the event loop after each guild, so a large node never blocks it.
+    """
+
+    accounting: list[GuildMemory] = []
+
+    for guild in guilds:
+        accounting.append(guild_memory(guild, sample_size))
+        await asyncio.sleep(0)
+
+    return CacheMemory(
+        mode=mode,
+        measured_at=time.time(),
+        members=sum(memory.members for memory in accounting),
+        estimated_bytes=sum(memory.estimated_bytes for memory in accounting),
+        largest_guilds=heapq.nlargest(top, accounting, key=lambda memory: memory.estimated_bytes),
+    )
+
+
+class CacheAccountant:
+    """Measures the gateway cache every interval and keeps the last snapshot."""
+
+    def __init__(self, interval: float, sample_size: int, top: int):
+        self.interval = interval
+        self.sample_size = sample_size
+        self.top = top
+
+        self.snapshot: CacheMemory | None = None
+
+    async def run(self):
+        """Measures the cache until cancelled."""
+
+        while True:
+            self.snapshot = await measure_cache(
+                howblox.guilds, CONFIG.GATEWAY_CACHE_MODE, self.sample_size, self.top
+            )
+
+            await asyncio.sleep(self.interval)
+
+
+cache_accountant = CacheAccountant(
+    interval=CONFIG.MEMORY_STATS_INTERVAL,
+    sample_size=CONFIG.MEMORY_STATS_SAMPLE_SIZE,
+    top=CONFIG.MEMORY_STATS_TOP_GUILDS,
+)
+
+create_task_log_exception(cache_accountant.run())
@@ -0,0 +1,223 @@
+"""
+A minimal Prometheus metrics registry, rendered in the text exposition format at /metrics.
+
+Metrics take their label values positionally, in the order of their label names.
+"""
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape_label_value(value: str) -> str:
+    """Escapes a label value for the exposition format."""
+
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def escape_help(text: str) -> str:
+    """Escapes the text of a HELP line, where quotes are left as they are."""
+
+    return text.replace("\\", r"\\").replace("\n", r"\n")
+
+
+def format_labels(names: Iterable[str], values: Iterable[str], **extra: str) -> str:
+    """Formats a label set."""
+
+    pairs = [*zip(names, values), *extra.items()]
+
+    if not pairs:
+        return ""
+
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value: float) -> str:
+    """Formats a sample value."""
+
+    if value == float("inf"):
+        return "+Inf"
+
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """A named metric with a fixed set of label names."""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+
+    def samples(self) -> Iterable[str]:
+        """Yields the sample lines of the metric."""
+
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Renders the metric with its HELP and TYPE lines."""
+
+        return "\n".join((
+            f"# HELP {self.name} {escape_help(self.documentation)}",
+            f"# TYPE {self.name} {self.type_name}",
+            *self.samples(),
+        ))
+
+
+class Counter(Metric):
+    """A value that only goes up."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        """Increments the counter of a label set."""
+
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for label_values, value in self._values.items():
+            yield f"{self.name}{format_labels(self.label_names, label_values)} {format_value(value)}"
+
+
+class Gauge(Metric):
+    """A value that goes up and down, or is read from a callback at scrape time."""
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        *,
+        callback: Callable[[], Iterable[tuple[tuple[str, ...], float]]] | None = None,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.callback = callback
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, *label_values: str):
+        """Sets the gauge of a label set."""
+
+        self._values[label_values] = value
+
+    def inc(self, *label_values: str, amount: float = 1):
+        """Increments the gauge of a label set."""
+
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values: str, amount: float = 1):
+        """Decrements the gauge of a label set."""
+
+        self.inc(*label_values, amount=-amount)
+
+    def samples(self) -> Iterable[str]:
+        values = self.callback() if self.callback else self._values.items()
+
+        for label_values, value in values:
+            yield f"{self.name}{format_labels(self.label_names, label_values)} {format_value(value)}"
+
+
+class Histogram(Metric):
+    """Counts observations into cumulative buckets."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        *,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: the count of each bucket (non-cumulative, plus +Inf), then the sum.
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        """Records an observation for a label set."""
+
+        entry = self._values.get(label_values)
+
+        if entry is None:
+            entry = self._values[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+
+        counts, total = entry
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def samples(self) -> Iterable[str]:
+        for label_values, (counts, total) in self._values.items():
+            cumulative = 0
+
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                labels = format_labels(self.label_names, label_values, le=format_value(bound))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+
+            labels = format_labels(self.label_names, label_values)
+            yield f"{self.name}_sum{labels} {format_value(total[0])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+    """Holds every metric exposed at /metrics."""
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register[M: Metric](self, metric: M) -> M:
+        """Adds a metric to the registry and returns it."""
+
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+
+        self._metrics[metric.name] = metric
+
+        return metric
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = MetricsRegistry()
+
+RELAY_REQUESTS = registry.register(Counter(
+    "relay_requests_total", "Relay requests handled, by endpoint and outcome.", ("endpoint", "outcome")
+))
+RELAY_HANDLER_SECONDS = registry.register(Histogram(
+    "relay_handler_seconds", "Time spent in endpoint handlers.", ("endpoint",)
+))
+RELAY_DISPATCH_LAG_SECONDS = registry.register(Histogram(
+    "relay_dispatch_lag_seconds",
+    "Time from receiving a pubsub message to starting its handler.",
+    ("endpoint",),
+))
+RELAY_PUBLISH_SECONDS = registry.register(Histogram(
+    "relay_publish_seconds", "Time taken to publish a response."
+))
+RELAY_IN_FLIGHT = registry.register(Gauge(
+    "relay_in_flight_requests", "Requests being handled, by endpoint.", ("endpoint",)
+))
+RELAY_COALESCED_REQUESTS = registry.register(Counter(
+    "relay_coalesced_requests_total",
+    "Requests answered with the result of an identical in-flight request, by endpoint.",
+    ("endpoint",),
+))
+BOT_API_REQUEST_SECONDS = registry.register(Histogram(
+    "bot_api_request_seconds", "Bot API request latency, by route.", ("route",)
+))
+GATEWAY_EVENTS = registry.register(Counter(
+    "discord_gateway_events_total", "Gateway events received, by shard and event type.", ("shard", "event")
+))
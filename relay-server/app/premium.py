@@ -0,0 +1,33 @@
+import logging
+from howblox_lib import StatusCodes
+from .bot_api import bot_api
+from .cache import TTLCache
+from .config import CONFIG
+from .types import PremiumResponse
+
+
+premium_cache: TTLCache[int, PremiumResponse] = TTLCache(
+    max_size=CONFIG.PREMIUM_CACHE_MAX_SIZE, ttl=CONFIG.PREMIUM_CACHE_TTL
+)
+
+
+async def _fetch_premium(guild_id: int) -> PremiumResponse | None:
+    """Fetches the premium status of a guild from the bot API."""
+
+    premium_status, response = await bot_api.request_typed(
+        PremiumResponse, "GET", f"/api/premium/guilds/{guild_id}", route="premium"
+    )
+
+    if response.status != StatusCodes.OK:
+        logging.error(f"Premium check error for guild {guild_id}: {response.status}")
+
+    return premium_status
+
+
+async def get_guild_premium(guild_id: int) -> PremiumResponse:
+    """Gets the premium status of a guild, sharing one lookup between concurrent callers.
+
+    Failed lookups are treated as non-premium and are not cached.
+    """
+
+    return await premium_cache.get_or_load(guild_id, lambda: _fetch_premium(guild_id)) or PremiumResponse()
@@ -0,0 +1,112 @@
+"""
+Progress tracking for /verifyall scans.
+
+Progress lives in a Redis hash at progress:{nonce} with the fields of VerifyAllProgress.
+Timestamps are stored as Unix seconds. Every update is one atomic round trip.
+
+Chunks are counted in a MULTI/EXEC transaction rather than a Lua script, so callers can
+add their own writes to it, as jobs do with their checkpoints. Scans are closed by
+finish_progress once their member stream ends, not when current_chunk reaches
+total_chunks: that total is estimated from Guild.member_count and can be off.
+"""
+import time
+from datetime import datetime, timedelta
+from redis.asyncio.client import Pipeline
+from howblox_lib import BaseModel
+from howblox_lib.database import redis
+
+
+PROGRESS_TTL = timedelta(days=2)
+
+
+class VerifyAllProgress(BaseModel):
+    """Progress of the /verifyall scan"""
+
+    started_at: datetime
+    ended_at: datetime | None = None
+    members_processed: int
+    total_members: int
+    current_chunk: int
+    total_chunks: int
+    chunks_failed: int = 0
+    members_failed: int = 0
+    cancelled: bool = False
+
+
+def progress_key(nonce: str) -> str:
+    """Returns the Redis key holding the progress of a scan."""
+
+    return f"progress:{nonce}"
+
+
+async def start_progress(nonce: str, total_members: int, total_chunks: int):
+    """Creates the progress record of a scan."""
+
+    key = progress_key(nonce)
+
+    async with redis.pipeline(transaction=True) as pipeline:
+        pipeline.delete(key)
+        pipeline.hset(key, mapping={
+            "started_at": time.time(),
+            "members_processed": 0,
+            "total_members": total_members,
+            "current_chunk": 0,
+            "total_chunks": total_chunks,
+        })
+        pipeline.expire(key, PROGRESS_TTL)
+        await pipeline.execute()
+
+
+def queue_progress(pipeline: Pipeline, nonce: str, members_processed: int, *, failed: bool = False):
+    """Queues the commands counting one delivered chunk, or one given up on, onto a pipeline."""
+
+    key = progress_key(nonce)
+
+    if failed:
+        pipeline.hincrby(key, "chunks_failed", 1)
+        pipeline.hincrby(key, "members_failed", members_processed)
+    else:
+        pipeline.hincrby(key, "current_chunk", 1)
+        pipeline.hincrby(key, "members_processed", members_processed)
+
+    pipeline.expire(key, PROGRESS_TTL)
+
+
+async def record_progress(nonce: str, members_processed: int) -> int:
+    """Atomically counts one delivered chunk of the scan. Returns the number of chunks counted so far."""
+
+    async with redis.pipeline(transaction=True) as pipeline:
+        queue_progress(pipeline, nonce, members_processed)
+        current_chunk, *_ = await pipeline.execute()
+
+    return current_chunk
+
+
+async def finish_progress(nonce: str, *, cancelled: bool = False):
+    """Marks a scan as ended."""
+
+    key = progress_key(nonce)
+
+    async with redis.pipeline(transaction=True) as pipeline:
+        pipeline.hsetnx(key, "ended_at", time.time())
+
+        if cancelled:
+            pipeline.hset(key, "cancelled", 1)
+
+        pipeline.expire(key, PROGRESS_TTL)
+        await pipeline.execute()
+
+
+async def fetch_progress(*nonces: str) -> dict[str, VerifyAllProgress | None]:
+    """Reads the progress of many scans in one round trip. Unknown or expired scans map to None."""
+
+    async with redis.pipeline(transaction=False) as pipeline:
+        for nonce in nonces:
+            pipeline.hgetall(progress_key(nonce))
+
+        records = await pipeline.execute()
+
+    return {
+        nonce: VerifyAllProgress.model_validate(record) if record else None
+        for nonce, record in zip(nonces, records)
+    }
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import logging
+from typing import Optional
+from redis.asyncio import Redis
+from howblox_lib import BaseModel, create_task_log_exception
+from .config import CONFIG
+from .howblox import howblox
+
+
+class RawJSON(str):
+    """A response body that is already serialized to JSON and is sent as-is."""
+
+
+def encode_response(nonce: Optional[str], data: "BaseModel | dict | list | RawJSON") -> str:
+    """Wraps a response in the envelope shared by every relay reply.
+
+    Models are serialized by pydantic and spliced into the envelope as-is, so the
+    response body is only encoded once. RawJSON bodies are not encoded at all.
+    """
+
+    if isinstance(data, RawJSON):
+        body = data
+    elif isinstance(data, BaseModel):
+        body = data.model_dump_json()
+    else:
+        body = json.dumps(data)
+
+    return f'{{"nonce":{json.dumps(nonce)},"cluster_id":{howblox.node_id},"data":{body}}}'
+
+
+class ResponsePublisher:
+    """Publishes relay responses in micro-batches.
+
+    Publishes made by concurrent handlers within the flush window are sent in one
+    non-transactional pipeline over a connection pool dedicated to publishing, so
+    replies never queue behind the subscriber connection or each other.
+    """
+
+    def __init__(self, flush_interval: float, max_batch_size: int, max_connections: int):
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self.max_connections = max_connections
+
+        self._redis: Redis | None = None
+        self._pending: list[tuple[str, str, asyncio.Future]] = []
+        self._flush_task: asyncio.Task | None = None
+
+    @property
+    def redis(self) -> Redis:
+        """The publisher's own Redis client, created on first use."""
+
+        if not self._redis:
+            self._redis = Redis.from_url(
+                CONFIG.REDIS_URL, max_connections=self.max_connections, decode_responses=True
+            )
+
+        return self._redis
+
+    async def publish(self, channel: str, message: str) -> int:
+        """Queues a message for the next flush and waits until it is published.
+
+        Returns the number of subscribers that received the message.
+        """
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((channel, message, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            create_task_log_exception(self._flush())
+        elif not self._flush_task:
+            self._flush_task = create_task_log_exception(self._flush_later())
+
+        return await future
+
+    async def _flush_later(self):
+        """Flushes pending messages once the flush window has elapsed."""
+
+        try:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush()
+        finally:
+            self._flush_task = None
+
+    async def _flush(self):
+        """Publishes every pending message in a single pipeline."""
+
+        batch, self._pending = self._pending, []
+
+        if not batch:
+            return
+
+        try:
+            async with self.redis.pipeline(transaction=False) as pipeline:
+                for channel, message, _ in batch:
+                    pipeline.publish(channel, message)
+
+                results = await pipeline.execute(raise_on_error=False)
+
+        except Exception as ex: # pylint: disable=broad-except
+            logging.error(f"Failed to publish a batch of {len(batch)} responses: {ex}")
+
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(ex)
+
+            return
+
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def close(self):
+        """Flushes anything still pending and closes the publisher's connections."""
+
+        await self._flush()
+
+        if self._redis:
+            await self._redis.aclose()
+            self._redis = None
+
+
+response_publisher = ResponsePublisher(
+    flush_interval=CONFIG.RELAY_PUBLISH_FLUSH_INTERVAL,
+    max_batch_size=CONFIG.RELAY_PUBLISH_MAX_BATCH_SIZE,
+    max_connections=CONFIG.RELAY_PUBLISH_MAX_CONNECTIONS,
+)
@@ -1,14 +1,23 @@
 import asyncio
 import time
-import json
+import random
 import logging
-from typing import Optional, Literal, TypeVar, Generic
+from typing import AsyncIterator, Optional, TypeVar, Generic
 from redis import exceptions as redis_exceptions
 
-from howblox_lib import find, BaseModel, parse_into, create_task_log_exception
+from howblox_lib import BaseModel, create_task_log_exception
 from howblox_lib.database import redis
-from .base import discover_endpoints, RelayEndpoint, RelayPath, RELAY_ENDPOINTS
+from .admission import admit, decode_request
+from .base import discover_endpoints, RelayEndpoint, RelayEnvelope, ENDPOINT_TABLE
+from .coalescing import coalesce_key, request_coalescer, serialize_body
+from .config import CONFIG
 from .howblox import howblox
+from .metrics import (
+    RELAY_DISPATCH_LAG_SECONDS, RELAY_HANDLER_SECONDS, RELAY_IN_FLIGHT, RELAY_PUBLISH_SECONDS, RELAY_REQUESTS
+)
+from .publisher import response_publisher, encode_response, RawJSON
+from .streams import stream_consumer, uses_streams
+from .types import Response
 
 
 redis_pubsub = redis.pubsub()
@@ -25,7 +34,7 @@ class RedisRelayRequest(Generic[T]):
         self.payload = payload
         self.received_at = received_at
 
-    async def respond(self, data: BaseModel | dict, *, channel: Optional[str] = None):
+    async def respond(self, data: BaseModel | dict | list | RawJSON, *, channel: Optional[str] = None):
         if not channel and not self.nonce:
             # System is intended to use n nonce (operation id) to track responses.
             # If not, a channel should be specified.
@@ -34,10 +43,12 @@ class RedisRelayRequest(Generic[T]):
         working_channel = channel or f"REPLY:{self.nonce}"
 
         try:
-            response_data = data.model_dump_json() if isinstance(data, BaseModel) else json.dumps({"nonce": self.nonce, "data": data, "cluster_id": howblox.node_id})
-            await redis.publish(working_channel, response_data)
+            encoded = encode_response(self.nonce, data)
+            publish_started_at = time.time_ns()
+            await response_publisher.publish(working_channel, encoded)
 
             published_at = time.time_ns()
+            RELAY_PUBLISH_SECONDS.observe((published_at - publish_started_at) / 1e9)
             logging.info(
                 f"Published response to {working_channel} in {(published_at - self.received_at) / 1000000:.3f}ms"
             )
@@ -54,46 +65,79 @@ class RedisRelayRequest(Generic[T]):
                 f"request {self.nonce} on {working_channel}: {e}"
             )
 
-class RedisMessage(BaseModel):
-    """A message from the Redis pubsub channel."""
 
-    type: Literal["message", "subscribe"]
-    nonce: str = None
-    pattern: str | None
-    channel: str
-    data: str | int | dict
+async def shed_request(endpoint: RelayEndpoint, channel: str, request: RedisRelayRequest):
+    """Turns a request away because its endpoint's queue is full."""
 
-class RedisMessageData(BaseModel):
-    """Data from a Redis message."""
+    RELAY_REQUESTS.inc(str(endpoint.path), "shed")
+    logging.warning(f"Shed request {request.nonce} on {channel}, {endpoint.queued} requests are queued.")
 
-    nonce: str
-    data: dict | None
+    if request.nonce:
+        await request.respond(Response(
+            success=False, nonce=request.nonce, error="The relay is overloaded, try again later."
+        ))
 
-async def handle_message(channel: str, message_data: RedisMessageData):
-    """Handles a message from the pubsub channel."""
 
-    received_at = time.time_ns()
+async def run_handler(endpoint: RelayEndpoint, request: RedisRelayRequest):
+    """Runs an admitted request through its endpoint, recording its dispatch lag and handler time."""
 
-    relay_channel = RelayPath(channel)
-    endpoint_name: str = relay_channel[0]
+    path = str(endpoint.path)
+    started_at = time.time_ns()
+    RELAY_DISPATCH_LAG_SECONDS.observe((started_at - request.received_at) / 1e9, path)
 
-    endpoint: RelayEndpoint | None = find(lambda e: e.path == endpoint_name, RELAY_ENDPOINTS)
+    try:
+        return await endpoint.handle(request)
+    finally:
+        RELAY_HANDLER_SECONDS.observe((time.time_ns() - started_at) / 1e9, path)
 
-    nonce = message_data.nonce
-    payload = parse_into(message_data.data, endpoint.payload_model) if endpoint else None
 
-    if not endpoint:
-        logging.warning("Ignored request, no suitable endpoints.")
+async def handle_message(endpoint: RelayEndpoint, channel: str, envelope: RelayEnvelope, received_at: int):
+    """Handles a relay request received over pubsub or a stream.
+
+    Requests already expired on arrival are dropped by decode_request. The rest are shed
+    with an error reply if the endpoint's queue is full, and dropped if they expire while
+    queued. Requests identical to one in flight on a coalescing endpoint wait for its reply
+    without being queued.
+    """
+
+    path = str(endpoint.path)
+    request = RedisRelayRequest(received_at, envelope.get("nonce"), envelope["data"])
+    key = coalesce_key(endpoint, request.payload) if endpoint.coalesce and request.nonce else None
+
+    if key and (leader := request_coalescer.leader(key)):
+        if response := await request_coalescer.follow(key, leader, request):
+            await request.respond(response)
+
+        RELAY_REQUESTS.inc(path, "coalesced")
+        return
+
+    if endpoint.queued >= endpoint.max_queued:
+        await shed_request(endpoint, channel, request)
         return
 
+    outcome = "error"
+    RELAY_IN_FLIGHT.inc(path)
+
     try:
-        request = RedisRelayRequest(received_at, nonce, payload)
-        response = await endpoint.handle(request)
+        with request_coalescer.lead(key) as flight:
+            async with admit(endpoint, envelope) as admitted:
+                if not admitted:
+                    outcome = "expired"
+                    return
+
+                response = await run_handler(endpoint, request)
+
+            if flight is not None:
+                response = serialize_body(response)
+                flight.set_result((request.nonce, response))
 
         if response:
             await request.respond(response)
 
+        outcome = "success"
+
     except TimeoutError:
+        outcome = "timeout"
         logging.error(f"Endpoint execution: {channel} exceeded process time!")
     # TODO: Catch few types of redis exceptions
 
@@ -103,36 +147,92 @@ async def handle_message(channel: str, message_data: RedisMessageData):
     except Exception as ex: # pylint: disable=broad-except
         logging.error(f"Endpoint {channel}: {ex.__class__.__name__} {ex}")
 
+    finally:
+        RELAY_IN_FLIGHT.dec(path)
+        RELAY_REQUESTS.inc(path, outcome)
+
+
+async def listen() -> AsyncIterator[list[dict]]:
+    """Yields batches of pubsub messages.
+
+    Blocks on the subscription until a message arrives, then drains everything already
+    buffered on the connection so a burst is dispatched in a single wakeup.
+    """
+
+    while True:
+        message = await redis_pubsub.get_message(ignore_subscribe_messages=True, timeout=None)
+        messages = [message] if message else []
+
+        while message := await redis_pubsub.get_message(ignore_subscribe_messages=True, timeout=0.0):
+            messages.append(message)
+
+        if messages:
+            yield messages
+
+
+def dispatch_message(message: dict, received_at: int):
+    """Schedules a raw pubsub message to be handled by its endpoint."""
+
+    if message["type"] != "message":
+        return
+
+    channel = message["channel"]
+    endpoint = ENDPOINT_TABLE.get(channel)
+
+    if not endpoint:
+        logging.warning("Ignored request, no suitable endpoints.")
+        return
+
+    try:
+        envelope = decode_request(endpoint, message["data"])
+    except ValueError as ex:
+        logging.error(f"Malformed message on {channel}: {ex}")
+        return
+
+    if envelope is None:
+        return
+
+    create_task_log_exception(handle_message(endpoint, channel, envelope, received_at))
+
 
 async def run():
     """Run the Redis pubsub listener."""
 
-    discover_endpoints()
+    discover_endpoints(howblox.shard_ids or (0,))
 
     # Subscribe to channels, including ones used to interact with relay endpoints.
-    endpoint_channels = [str(e.path) for e in RELAY_ENDPOINTS]
-    logging.info(f"Connecting to pubsub channels: {endpoint_channels}")
+    # Endpoints moved to streams are read by the stream consumer instead.
+    endpoint_channels = [channel for channel in ENDPOINT_TABLE if not uses_streams(channel)]
+    stream_endpoints = {
+        channel: endpoint for channel, endpoint in ENDPOINT_TABLE.items() if uses_streams(channel)
+    }
 
-    await redis_pubsub.subscribe(*endpoint_channels)
+    if stream_endpoints:
+        create_task_log_exception(stream_consumer.run(stream_endpoints, handle_message))
 
-    logging.info("Listening for messages.")
+    reconnect_delay = CONFIG.RELAY_RECONNECT_MIN_DELAY
 
     while True:
         try:
-            message = await redis_pubsub.get_message(ignore_subscribe_messages=True)
+            logging.info(f"Connecting to pubsub channels: {endpoint_channels}")
+            await redis_pubsub.subscribe(*endpoint_channels)
+
+            logging.info("Listening for messages.")
+            reconnect_delay = CONFIG.RELAY_RECONNECT_MIN_DELAY
+
+            async for messages in listen():
+                received_at = time.time_ns()
 
-            if message:
-                parsed_message = RedisMessage(**message)
-                print(parsed_message)
+                for message in messages:
+                    dispatch_message(message, received_at)
 
-                if parsed_message.type == "message":
-                    create_task_log_exception(handle_message(parsed_message.channel, RedisMessageData(**json.loads(parsed_message.data))))
+        except (redis_exceptions.ConnectionError, redis_exceptions.TimeoutError) as e:
+            logging.error(f"Redis connection error: {e}, resubscribing in {reconnect_delay:.1f}s")
 
-        except redis_exceptions.ConnectionError as e:
-            logging.error(f"Redis connection error: {e}")
-            await asyncio.sleep(5)
+            await redis_pubsub.reset()
+            await asyncio.sleep(reconnect_delay * random.uniform(1, 1.5))
 
-        await asyncio.sleep(0.1)
+            reconnect_delay = min(reconnect_delay * 2, CONFIG.RELAY_RECONNECT_MAX_DELAY)
 
 
 create_task_log_exception(run())
\ No newline at end of file
@@ -0,0 +1,251 @@
+"""
+The requesting side of the relay.
+
+RelayClient publishes a request to an endpoint channel and gathers the replies that
+clusters publish to REPLY:{nonce}, until the expected number of clusters has answered
+or the deadline passes. Every request shares one pubsub connection.
+"""
+import json
+import asyncio
+import logging
+from time import perf_counter, time
+from typing import Any, Iterable
+from uuid import uuid4
+from redis.asyncio import Redis
+from redis.asyncio.client import PubSub
+from howblox_lib import BaseModel, create_task_log_exception
+from howblox_lib.database import redis
+from .base import shard_channel, shard_for_guild
+from .config import CONFIG
+from .streams import publish_request, uses_streams
+
+
+class ClusterReply(BaseModel):
+    """The reply of one cluster, with its parts merged."""
+
+    cluster_id: int
+    latency: float  # ms from publishing the request to receiving the last part of the reply
+    data: Any
+
+
+class GatherResult(BaseModel):
+    """The replies gathered for a request."""
+
+    nonce: str
+    expected: int
+    replies: dict[int, ClusterReply]
+
+    @property
+    def complete(self) -> bool:
+        """Whether every expected cluster replied before the deadline."""
+
+        return len(self.replies) >= self.expected
+
+    def merged(self) -> Any:
+        """Merges the result field of every successful reply."""
+
+        return merge_results(
+            reply.data.get("result") for reply in self.replies.values()
+            if isinstance(reply.data, dict) and reply.data.get("success")
+        )
+
+
+def merge_results(results: Iterable[Any]) -> Any:
+    """Merges dict results by key and list results by concatenation. Anything else is collected in a list."""
+
+    results = [result for result in results if result is not None]
+
+    if results and all(isinstance(result, dict) for result in results):
+        return {key: value for result in results for key, value in result.items()}
+
+    if all(isinstance(result, list) for result in results):
+        return [item for result in results for item in result]
+
+    return results
+
+
+def group_by_shard(guild_ids: Iterable[int]) -> dict[int, list[int]]:
+    """Groups guild IDs by the shard they are on, to send one request per shard channel."""
+
+    shards: dict[int, list[int]] = {}
+
+    for guild_id in guild_ids:
+        shards.setdefault(shard_for_guild(guild_id), []).append(guild_id)
+
+    return shards
+
+
+class ReplyGatherer:
+    """Collects the replies of each cluster, joining replies sent in several parts."""
+
+    def __init__(self, nonce: str, expected: int):
+        self.nonce = nonce
+        self.expected = expected
+
+        self.replies: dict[int, ClusterReply] = {}
+        self._parts: dict[int, dict[int, dict]] = {}
+
+    @property
+    def complete(self) -> bool:
+        """Whether every expected cluster has replied in full."""
+
+        return len(self.replies) >= self.expected
+
+    def add(self, message: dict, latency: float):
+        """Adds one reply message."""
+
+        cluster_id = message.get("cluster_id")
+        data = message.get("data")
+
+        if cluster_id is None or cluster_id in self.replies:
+            return
+
+        if not isinstance(data, dict) or "parts" not in data:
+            self.replies[cluster_id] = ClusterReply(cluster_id=cluster_id, latency=latency, data=data)
+            return
+
+        parts = self._parts.setdefault(cluster_id, {})
+        parts[data["part"]] = data
+
+        if len(parts) < data["parts"]:
+            return
+
+        ordered = [parts[part] for part in sorted(parts)]
+        merged = {key: value for key, value in ordered[0].items() if key not in ("part", "parts")}
+        merged["result"] = merge_results(part.get("result") for part in ordered)
+
+        del self._parts[cluster_id]
+        self.replies[cluster_id] = ClusterReply(cluster_id=cluster_id, latency=latency, data=merged)
+
+    def result(self) -> GatherResult:
+        """Returns what was gathered so far."""
+
+        return GatherResult(nonce=self.nonce, expected=self.expected, replies=self.replies)
+
+
+class RelayClient:
+    """Publishes relay requests and gathers the replies of the clusters."""
+
+    def __init__(self, client: Redis, default_timeout: float):
+        self.redis = client
+        self.default_timeout = default_timeout
+
+        self._pubsub: PubSub | None = None
+        self._reader: asyncio.Task | None = None
+        self._queues: dict[str, asyncio.Queue[tuple[float, str]]] = {}
+
+    async def request(
+        self,
+        channel: str,
+        payload: BaseModel | dict | None = None,
+        *,
+        expected: int | None = None,
+        timeout: float | None = None,
+        first_response: bool = False,
+    ) -> GatherResult:
+        """Publishes a request and gathers replies until enough clusters answered or the deadline passes.
+
+        By default every cluster subscribed to the channel, as counted by PUBLISH, is
+        expected to reply. In first_response mode the first complete reply wins, which
+        suits guild lookups that only the node holding the guild answers. Replies still
+        missing at the deadline are left out; check GatherResult.complete.
+        """
+
+        if isinstance(payload, BaseModel):
+            payload = payload.model_dump(mode="json", by_alias=True)
+
+        nonce = uuid4().hex
+        reply_channel = f"REPLY:{nonce}"
+        queue = await self._subscribe(reply_channel)
+
+        try:
+            timeout = timeout or self.default_timeout
+            now = time()
+            message = json.dumps(
+                {"nonce": nonce, "data": payload, "sent_at": now, "deadline": now + timeout}
+            )
+            sent_at = perf_counter()
+
+            if uses_streams(channel):
+                receivers = await publish_request(self.redis, channel, message)
+            else:
+                receivers = await self.redis.publish(channel, message)
+
+            gatherer = ReplyGatherer(nonce, 1 if first_response else expected or receivers)
+
+            try:
+                async with asyncio.timeout(timeout):
+                    while not gatherer.complete:
+                        received_at, raw_message = await queue.get()
+                        gatherer.add(json.loads(raw_message), (received_at - sent_at) * 1000)
+
+            except TimeoutError:
+                logging.debug(
+                    f"Relay request {nonce} on {channel} got {len(gatherer.replies)} of "
+                    f"{gatherer.expected} replies before the deadline."
+                )
+
+        finally:
+            await self._unsubscribe(reply_channel)
+
+        return gatherer.result()
+
+    async def request_guild(
+        self,
+        channel: str,
+        guild_id: int,
+        payload: BaseModel | dict | None = None,
+        *,
+        timeout: float | None = None,
+    ) -> GatherResult:
+        """Sends a request about one guild to the node running its shard and waits for its reply."""
+
+        return await self.request(
+            shard_channel(channel, shard_for_guild(guild_id)), payload, timeout=timeout, first_response=True
+        )
+
+    async def _subscribe(self, channel: str) -> asyncio.Queue[tuple[float, str]]:
+        """Subscribes to a reply channel and returns the queue its messages are delivered to."""
+
+        queue = self._queues[channel] = asyncio.Queue()
+
+        if not self._pubsub:
+            self._pubsub = self.redis.pubsub()
+
+        await self._pubsub.subscribe(channel)
+
+        if not self._reader or self._reader.done():
+            self._reader = create_task_log_exception(self._read())
+
+        return queue
+
+    async def _unsubscribe(self, channel: str):
+        """Stops listening to a reply channel."""
+
+        self._queues.pop(channel, None)
+        await self._pubsub.unsubscribe(channel)
+
+    async def _read(self):
+        """Routes reply messages to the requests waiting for them while any request is waiting."""
+
+        while self._queues:
+            message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+
+            if not message or message["type"] != "message":
+                continue
+
+            if queue := self._queues.get(message["channel"]):
+                queue.put_nowait((perf_counter(), message["data"]))
+
+    async def close(self):
+        """Closes the shared pubsub connection."""
+
+        if self._reader:
+            self._reader.cancel()
+
+        if self._pubsub:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+
+relay_client = RelayClient(redis, default_timeout=CONFIG.RELAY_CLIENT_TIMEOUT)
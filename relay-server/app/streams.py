@@ -0,0 +1,242 @@
+"""
+Redis Streams transport for relay requests.
+
+Endpoints listed in RELAY_STREAM_ENDPOINTS receive their requests from the stream
+STREAM:{channel} instead of the pubsub channel. Every node reads the streams through its
+own consumer group, so each node still sees every request, but requests published while
+the node is down or reconnecting wait in the stream instead of being lost. An entry is
+acknowledged once its handler finished, and entries left pending by a node that died
+mid-request are reclaimed after RELAY_STREAM_CLAIM_IDLE. Entries the node is still
+handling are never reclaimed, however long their handler runs. Replies still go over pubsub.
+"""
+import time
+import random
+import asyncio
+import logging
+from typing import Awaitable, Callable
+from redis.asyncio import Redis
+from redis import exceptions as redis_exceptions
+from howblox_lib import create_task_log_exception
+from howblox_lib.database import redis
+from .admission import decode_request
+from .base import RelayEndpoint, RelayEnvelope, RelayPath
+from .config import CONFIG
+from .howblox import howblox
+
+
+StreamHandler = Callable[[RelayEndpoint, str, RelayEnvelope, int], Awaitable[None]]
+
+
+def stream_key(channel: str) -> str:
+    """Returns the stream carrying the requests of a channel."""
+
+    return f"STREAM:{channel}"
+
+
+def uses_streams(channel: str) -> bool:
+    """Whether requests to a channel, or to a shard channel of it, are sent over streams."""
+
+    path = RelayPath(channel)
+
+    if len(path) > 1 and path[-1].isdigit():
+        path = RelayPath(path[:-1])
+
+    return str(path) in CONFIG.RELAY_STREAM_ENDPOINTS
+
+
+async def publish_request(client: Redis, channel: str, message: str) -> int:
+    """Appends a request to a channel's stream. Returns the number of nodes reading the stream."""
+
+    key = stream_key(channel)
+
+    async with client.pipeline(transaction=False) as pipeline:
+        pipeline.xadd(key, {"message": message}, maxlen=CONFIG.RELAY_STREAM_MAXLEN, approximate=True)
+        pipeline.xinfo_groups(key)
+        _, groups = await pipeline.execute()
+
+    return len(groups)
+
+
+class StreamConsumer:
+    """Reads relay requests from streams in batches and acknowledges them once handled."""
+
+    def __init__(
+        self,
+        *,
+        batch_size: int,
+        block: float,
+        max_pending: int,
+        claim_idle: float,
+        claim_interval: float,
+    ):
+        self.batch_size = batch_size
+        self.block = block
+        self.max_pending = max_pending
+        self.claim_idle = claim_idle
+        self.claim_interval = claim_interval
+
+        self.group = f"relay-node-{howblox.node_id}"
+        self.consumer = f"node-{howblox.node_id}"
+
+        self._endpoints: dict[str, tuple[str, RelayEndpoint]] = {}
+        # Keyed by stream and entry ID, so reclaiming skips entries still being handled.
+        self._in_flight: dict[tuple[str, str], asyncio.Task] = {}
+
+    async def run(self, endpoints: dict[str, RelayEndpoint], handle: StreamHandler):
+        """Consumes the streams of the given channels until cancelled."""
+
+        self._endpoints = {
+            stream_key(channel): (channel, endpoint) for channel, endpoint in endpoints.items()
+        }
+        reconnect_delay = CONFIG.RELAY_RECONNECT_MIN_DELAY
+
+        while True:
+            try:
+                await self._create_groups()
+                claimer = create_task_log_exception(self._reclaim(handle))
+                logging.info(f"Reading request streams: {list(self._endpoints)}")
+                reconnect_delay = CONFIG.RELAY_RECONNECT_MIN_DELAY
+
+                try:
+                    await self._read(handle)
+                finally:
+                    claimer.cancel()
+
+            except (redis_exceptions.ConnectionError, redis_exceptions.TimeoutError) as e:
+                logging.error(f"Redis connection error: {e}, reading streams again in {reconnect_delay:.1f}s")
+
+            except redis_exceptions.ResponseError as e:
+                # The stream was deleted, flushed or trimmed away with its group: create it again.
+                if "NOGROUP" in str(e):
+                    logging.warning(f"Lost a request stream consumer group: {e}, creating it again.")
+                    continue
+
+                logging.error(f"Redis error: {e}, reading streams again in {reconnect_delay:.1f}s")
+
+            await asyncio.sleep(reconnect_delay * random.uniform(1, 1.5))
+
+            reconnect_delay = min(reconnect_delay * 2, CONFIG.RELAY_RECONNECT_MAX_DELAY)
+
+    async def _create_groups(self):
+        """Creates this node's consumer group on every stream that lacks it."""
+
+        for key in self._endpoints:
+            try:
+                await redis.xgroup_create(key, self.group, id="$", mkstream=True)
+            except redis_exceptions.ResponseError as ex:
+                if "BUSYGROUP" not in str(ex):
+                    raise
+
+    async def _read(self, handle: StreamHandler):
+        """Reads new entries in batches, never holding more than max_pending unacknowledged."""
+
+        streams = {key: ">" for key in self._endpoints}
+
+        while True:
+            if len(self._in_flight) >= self.max_pending:
+                await asyncio.wait(self._in_flight.values(), return_when=asyncio.FIRST_COMPLETED)
+
+            entries = await redis.xreadgroup(
+                self.group,
+                self.consumer,
+                streams,
+                count=min(self.batch_size, self.max_pending - len(self._in_flight)),
+                block=int(self.block * 1000),
+            )
+            received_at = time.time_ns()
+
+            for key, messages in entries or ():
+                for entry_id, fields in messages:
+                    self._dispatch(handle, key, entry_id, fields, received_at)
+
+    async def _reclaim(self, handle: StreamHandler):
+        """Periodically takes over entries that stayed unacknowledged for longer than claim_idle."""
+
+        while True:
+            await asyncio.sleep(self.claim_interval)
+
+            for key in self._endpoints:
+                try:
+                    await self._reclaim_stream(handle, key)
+                except redis_exceptions.ResponseError as e:
+                    # A lost group is created again by the reader, the next round picks the stream up.
+                    logging.warning(f"Could not reclaim requests of {key}: {e}")
+
+    async def _reclaim_stream(self, handle: StreamHandler, key: str):
+        """Takes over the idle entries of one stream, skipping those this node is still handling."""
+
+        start_id = "0-0"
+
+        while True:
+            start_id, messages, *_ = await redis.xautoclaim(
+                key,
+                self.group,
+                self.consumer,
+                min_idle_time=int(self.claim_idle * 1000),
+                start_id=start_id,
+                count=self.batch_size,
+            )
+            received_at = time.time_ns()
+
+            for entry_id, fields in messages:
+                if (key, entry_id) in self._in_flight:
+                    continue
+
+                logging.warning(f"Reclaimed request {entry_id} of {key}.")
+                self._dispatch(handle, key, entry_id, fields, received_at)
+
+            if start_id in ("0-0", b"0-0"):
+                break
+
+    def _dispatch(
+        self, handle: StreamHandler, key: str, entry_id: str, fields: dict | None, received_at: int
+    ):
+        """Schedules a stream entry to be handled by its endpoint and acknowledged afterwards."""
+
+        channel, endpoint = self._endpoints[key]
+
+        # Entries trimmed away before they were claimed come back without fields.
+        if not fields:
+            create_task_log_exception(redis.xack(key, self.group, entry_id))
+            return
+
+        try:
+            envelope = decode_request(endpoint, fields["message"])
+        except (KeyError, ValueError) as ex:
+            logging.error(f"Malformed stream entry {entry_id} on {channel}: {ex}")
+            envelope = None
+
+        # Malformed entries and requests whose caller gave up are acknowledged without handling.
+        if envelope is None:
+            create_task_log_exception(redis.xack(key, self.group, entry_id))
+            return
+
+        task = create_task_log_exception(
+            self._handle(handle, endpoint, channel, envelope, received_at, key, entry_id)
+        )
+        task.add_done_callback(lambda _: self._in_flight.pop((key, entry_id), None))
+        self._in_flight[key, entry_id] = task
+
+    async def _handle(
+        self,
+        handle: StreamHandler,
+        endpoint: RelayEndpoint,
+        channel: str,
+        envelope: RelayEnvelope,
+        received_at: int,
+        key: str,
+        entry_id: str,
+    ):
+        """Handles an entry and acknowledges it."""
+
+        await handle(endpoint, channel, envelope, received_at)
+        await redis.xack(key, self.group, entry_id)
+
+
+stream_consumer = StreamConsumer(
+    batch_size=CONFIG.RELAY_STREAM_BATCH_SIZE,
+    block=CONFIG.RELAY_STREAM_BLOCK,
+    max_pending=CONFIG.RELAY_STREAM_MAX_PENDING,
+    claim_idle=CONFIG.RELAY_STREAM_CLAIM_IDLE,
+    claim_interval=CONFIG.RELAY_STREAM_CLAIM_INTERVAL,
+)
@@ -2,10 +2,11 @@
 
 
 import uvicorn
-from blacksheep import Application, get, json
+from blacksheep import Application, Content, Response, get, json
 from howblox_lib import create_task_log_exception
 
 from ..config import CONFIG
+from ..metrics import registry
 
 app = Application()
 
@@ -18,6 +19,15 @@ async def index():
     return json({"message": "Relay server is running!"})
 
 
+@get("/metrics")
+async def metrics():
+    """Prometheus metrics route."""
+
+    return Response(
+        200, content=Content(b"text/plain; version=0.0.4; charset=utf-8", registry.render().encode())
+    )
+
+
 async def main():
     """Starts the server."""
 
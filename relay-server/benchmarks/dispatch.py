@@ -0,0 +1,95 @@
+"""
+Microbenchmark for the per-message dispatch overhead of the relay.
+
+Compares the legacy path (wrapping the frame in RedisMessage, json.loads, RedisMessageData,
+building a RelayPath, a linear search over every endpoint and a generic parse_into) with the
+channel table and single-pass envelope decoding.
+
+Run from the relay-server directory:
+    python -m benchmarks.dispatch
+"""
+import os
+import json
+import timeit
+from typing import Literal
+
+for env_name, env_default in {
+    "BOT_RELEASE": "LOCAL",
+    "HTTP_BOT_API": "http://localhost:8000",
+    "HTTP_BOT_AUTH": "",
+    "REDIS_URL": "redis://localhost:6379",
+    "MONGO_URL": "mongodb://localhost:27017",
+    "DISCORD_TOKEN": "",
+}.items():
+    os.environ.setdefault(env_name, env_default)
+
+# pylint: disable=wrong-import-position
+from pydantic import Field
+from howblox_lib import BaseModel, find, parse_into
+from app.base import RelayEndpoint, RelayPath
+
+
+ITERATIONS = 200_000
+CHANNELS = ("REQUEST_STATS", "VERIFICATION", "VERIFYALL", "CACHE_LOOKUP")
+
+
+class Payload(BaseModel):
+    """Mirror of the CACHE_LOOKUP payload."""
+
+    guild_id: int = Field(alias="guildID")
+    type: Literal["channels", "roles", "guild"]
+
+
+class RedisMessage(BaseModel):
+    """The pubsub wrapper model the legacy path built for every frame."""
+
+    type: Literal["message", "subscribe"]
+    pattern: str | None
+    channel: str
+    data: str | int | dict
+
+
+class RedisMessageData(BaseModel):
+    """The request envelope model the legacy path built for every frame."""
+
+    nonce: str
+    data: dict | None
+
+
+class BenchmarkEndpoint(RelayEndpoint[Payload]):
+    """An endpoint that is only dispatched to, never handled."""
+
+    async def handle(self, request):
+        return None
+
+
+def main():
+    """Runs both dispatch paths against the last registered channel, the legacy worst case."""
+
+    endpoints = [BenchmarkEndpoint(channel, Payload) for channel in CHANNELS]
+    table = {str(endpoint.path): endpoint for endpoint in endpoints}
+    channel = CHANNELS[-1]
+    frame = {
+        "type": "message",
+        "pattern": None,
+        "channel": channel,
+        "data": json.dumps({"nonce": "benchmark", "data": {"guildID": 123456789012345678, "type": "roles"}}),
+    }
+
+    def legacy_dispatch():
+        message = RedisMessage(**frame)
+        message_data = RedisMessageData(**json.loads(message.data))
+        endpoint_name = RelayPath(message.channel)[0]
+        endpoint = find(lambda e: e.path == endpoint_name, endpoints)
+        return parse_into(message_data.data, endpoint.payload_model)
+
+    def table_dispatch():
+        return table[frame["channel"]].decode(frame["data"])["data"]
+
+    for name, dispatch in (("legacy", legacy_dispatch), ("table", table_dispatch)):
+        elapsed = min(timeit.repeat(dispatch, number=ITERATIONS, repeat=5))
+        print(f"{name:>8}: {elapsed / ITERATIONS * 1_000_000:.3f}us per message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+"""
+End-to-end throughput and latency benchmark of the relay.
+
+Runs the real pubsub consumer, endpoints and response publisher against an in-process
+Redis stand-in, with the Howblox client stubbed to serve synthetic guilds and the bot API
+served by a local aiohttp server. For every scenario it reports messages per second,
+p50/p99 latency from publishing a request to its reply being published, and the peak
+traced memory, and writes the results as JSON so runs can be compared across commits.
+Requests that get an error reply, or no reply within --timeout, are reported as failures
+and fail the run.
+
+Run from the relay-server directory:
+    python -m benchmarks.relay [--messages 5000] [--output results.json] [--compare baseline.json]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tracemalloc
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+import discord
+from aiohttp import web
+
+
+def free_port() -> int:
+    """Returns a local port that is free right now."""
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+BOT_API_PORT = free_port()
+
+for env_name, env_default in {
+    "BOT_RELEASE": "LOCAL",
+    "HTTP_BOT_API": f"http://127.0.0.1:{BOT_API_PORT}",
+    "HTTP_BOT_AUTH": "",
+    "REDIS_URL": "redis://localhost:6379",
+    "MONGO_URL": "mongodb://localhost:27017",
+    "DISCORD_TOKEN": "",
+}.items():
+    os.environ.setdefault(env_name, env_default)
+
+
+class FakePubSub:
+    """The subset of redis.asyncio.client.PubSub the relay uses, backed by an asyncio queue."""
+
+    def __init__(self, server: "FakeRedis"):
+        self.server = server
+        self.channels: set[str] = set()
+        self.queue: asyncio.Queue[dict] = asyncio.Queue()
+
+    async def subscribe(self, *channels: str):
+        for channel in channels:
+            self.channels.add(channel)
+            self.server.subscribers[channel].add(self)
+
+    async def unsubscribe(self, *channels: str):
+        for channel in channels or tuple(self.channels):
+            self.channels.discard(channel)
+            self.server.subscribers[channel].discard(self)
+
+    async def get_message(self, ignore_subscribe_messages: bool = False, timeout: float | None = 0.0):
+        if timeout is None:
+            return await self.queue.get()
+
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout) if timeout else self.queue.get_nowait()
+        except (asyncio.QueueEmpty, TimeoutError):
+            return None
+
+    async def reset(self):
+        await self.unsubscribe()
+
+    async def aclose(self):
+        await self.reset()
+
+
+class FakePipeline:
+    """Queues commands and runs them against the fake server on execute."""
+
+    def __init__(self, server: "FakeRedis"):
+        self.server = server
+        self.commands: list[tuple[str, tuple]] = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        self.commands.clear()
+
+    def __getattr__(self, name: str) -> Callable[..., "FakePipeline"]:
+        def queue(*args, **_):
+            self.commands.append((name, args))
+            return self
+
+        return queue
+
+    async def execute(self, raise_on_error: bool = True) -> list[Any]:
+        results = [
+            await self.server.publish(*args) if name == "publish" else None for name, args in self.commands
+        ]
+        self.commands.clear()
+
+        return results
+
+
+class FakeRedis:
+    """An in-process pubsub server that timestamps every reply it sees."""
+
+    def __init__(self):
+        self.subscribers: defaultdict[str, set[FakePubSub]] = defaultdict(set)
+        self.replies: dict[str, asyncio.Future[tuple[int, str]]] = {}
+
+    def pubsub(self) -> FakePubSub:
+        return FakePubSub(self)
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    async def publish(self, channel: str, message: str) -> int:
+        if channel.startswith("REPLY:") and (reply := self.replies.get(channel)) and not reply.done():
+            reply.set_result((time.perf_counter_ns(), message))
+
+        receivers = self.subscribers.get(channel, ())
+
+        for pubsub in receivers:
+            pubsub.queue.put_nowait({"type": "message", "pattern": None, "channel": channel, "data": message})
+
+        return len(receivers)
+
+
+@dataclass(slots=True)
+class SyntheticRole:
+    id: int
+    name: str
+    color: discord.Colour
+    hoist: bool
+    position: int
+    permissions: discord.Permissions
+    managed: bool = False
+
+
+@dataclass(slots=True)
+class SyntheticCategory:
+    id: int
+    name: str
+    position: int
+
+
+class SyntheticTextChannel(discord.TextChannel):
+    """A text channel holding only the fields the endpoints read."""
+
+    def __init__(self, channel_id: int, name: str, position: int):  # pylint: disable=super-init-not-called
+        self.id = channel_id
+        self.name = name
+        self.position = position
+
+
+@dataclass(slots=True)
+class SyntheticGuild:
+    """A stand-in for discord.Guild with roles and categorized channels."""
+
+    id: int
+    name: str
+    member_count: int
+    roles: list[SyntheticRole]
+    channel_groups: list[tuple[SyntheticCategory | None, list[SyntheticTextChannel]]]
+    icon: str | None = None
+    splash: str | None = None
+    owner_id: int = 1
+    created_at: datetime = field(default_factory=lambda: datetime(2020, 1, 1, tzinfo=timezone.utc))
+
+    def by_category(self):
+        return self.channel_groups
+
+
+def create_guild(index: int, roles: int, categories: int, channels_per_category: int) -> SyntheticGuild:
+    """Creates a deterministic synthetic guild."""
+
+    guild_id = (index + 1) << 22
+    snowflake = iter(range(guild_id + 1, guild_id + 1_000_000))
+    channels = range(channels_per_category)
+
+    return SyntheticGuild(
+        id=guild_id,
+        name=f"guild{index}",
+        member_count=1000 + index,
+        roles=[
+            SyntheticRole(
+                next(snowflake), f"role{r}", discord.Colour(r * 997), r % 5 == 0, r, discord.Permissions(r)
+            )
+            for r in range(roles)
+        ],
+        channel_groups=[
+            (
+                SyntheticCategory(next(snowflake), f"category{c}", c),
+                [SyntheticTextChannel(next(snowflake), f"channel{n}", n) for n in channels],
+            )
+            for c in range(categories)
+        ],
+    )
+
+
+async def start_bot_api() -> web.AppRunner:
+    """Serves every bot API route the relay calls with an immediate 200."""
+
+    async def ok(_request: web.Request) -> web.Response:
+        return web.json_response({"success": True})
+
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", ok)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", BOT_API_PORT).start()
+
+    return runner
+
+
+@dataclass(slots=True)
+class Scenario:
+    name: str
+    channel: str
+    payload: Callable[[int], dict]
+
+
+def milliseconds(value: float | None) -> str:
+    """Formats a latency, which is None if no request of the scenario succeeded."""
+
+    return "n/a" if value is None else f"{value}ms"
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Returns the value at a fraction of the sorted values."""
+
+    return sorted(values)[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def run_scenario(
+    server: FakeRedis, scenario: Scenario, messages: int, concurrency: int, timeout: float
+) -> dict:
+    """Publishes messages through the fake server and measures the replies.
+
+    Only successful replies count towards the latencies. Error replies and requests left
+    without a reply after timeout seconds are counted separately.
+    """
+
+    window = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = timeouts = 0
+
+    async def send(index: int):
+        nonlocal errors, timeouts
+
+        async with window:
+            nonce = f"{scenario.name}-{index}-{time.perf_counter_ns()}"
+            reply = server.replies[f"REPLY:{nonce}"] = asyncio.get_running_loop().create_future()
+            sent_at = time.perf_counter_ns()
+
+            message = json.dumps({"nonce": nonce, "data": scenario.payload(index)})
+            await server.publish(scenario.channel, message)
+
+            try:
+                replied_at, body = await asyncio.wait_for(reply, timeout)
+            except TimeoutError:
+                timeouts += 1
+                return
+            finally:
+                del server.replies[f"REPLY:{nonce}"]
+
+            data = json.loads(body)["data"]
+
+            if isinstance(data, dict) and data.get("success") is False:
+                errors += 1
+            else:
+                latencies.append((replied_at - sent_at) / 1e6)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(send(index) for index in range(messages)))
+    elapsed = time.perf_counter() - started_at
+
+    return {
+        "messages": messages,
+        "messages_per_second": round(messages / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99), 3) if latencies else None,
+        "errors": errors,
+        "timeouts": timeouts,
+    }
+
+
+async def measure(scenarios: list[Scenario], args: argparse.Namespace) -> dict:
+    """Starts the relay on the fake server and runs every scenario."""
+
+    # The relay binds the Redis client when its modules are imported, so swap it in first.
+    # pylint: disable=import-outside-toplevel, protected-access
+    import howblox_lib.database
+
+    server = FakeRedis()
+    howblox_lib.database.redis = server
+
+    from app.howblox import howblox
+    from app.publisher import response_publisher
+
+    guilds = {
+        guild.id: guild
+        for guild in (create_guild(i, args.roles, args.categories, args.channels) for i in range(args.guilds))
+    }
+    howblox.get_guild = guilds.get
+    howblox.shard_ids = [0]
+    response_publisher._redis = server
+
+    import app.redis  # pylint: disable=unused-import # starts the consumer
+
+    bot_api_runner = await start_bot_api()
+    guild_ids = list(guilds)
+    results = {}
+
+    while not server.subscribers:
+        await asyncio.sleep(0.01)
+
+    try:
+        # Warm up the snapshot cache, validators and connection pool before measuring.
+        for scenario in scenarios:
+            await run_scenario(server, scenario, min(len(guild_ids), 500), args.concurrency, args.timeout)
+
+        for scenario in scenarios:
+            result = await run_scenario(server, scenario, args.messages, args.concurrency, args.timeout)
+
+            tracemalloc.start()
+            traced = await run_scenario(server, scenario, args.messages, args.concurrency, args.timeout)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            result["errors"] += traced["errors"]
+            result["timeouts"] += traced["timeouts"]
+            result["peak_memory_mib"] = round(peak / 1024 / 1024, 2)
+            results[scenario.name] = result
+            print(
+                f"{scenario.name:>24}: {result['messages_per_second']:>9} msg/s, "
+                f"p50 {milliseconds(result['p50_ms'])}, p99 {milliseconds(result['p99_ms'])}, "
+                f"peak {result['peak_memory_mib']} MiB, "
+                f"{result['errors']} errors, {result['timeouts']} timeouts"
+            )
+    finally:
+        await bot_api_runner.cleanup()
+
+    return results
+
+
+def build_scenarios(guild_ids: list[int]) -> list[Scenario]:
+    """The requests benchmarked, spread over the synthetic guilds."""
+
+    def guild(index: int) -> int:
+        return guild_ids[index % len(guild_ids)]
+
+    lookup_types = ["guild", "roles", "channels"]
+
+    return [
+        *(
+            Scenario(f"cache_lookup_{t}", "CACHE_LOOKUP", lambda i, t=t: {"guildID": guild(i), "type": t})
+            for t in lookup_types
+        ),
+        Scenario(
+            "cache_lookup_batch",
+            "CACHE_LOOKUP:BATCH",
+            lambda i: {"guildIDs": [guild(i + n) for n in range(10)], "types": lookup_types},
+        ),
+        Scenario("request_stats", "REQUEST_STATS", lambda i: None),
+        Scenario("verification", "VERIFICATION", lambda i: {"user_id": i + 1, "guild_ids": [guild(i)]}),
+    ]
+
+
+def git_commit() -> str | None:
+    """Returns the commit being benchmarked, if run inside a git checkout."""
+
+    try:
+        return subprocess.run(
+            ("git", "rev-parse", "--short", "HEAD"), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline_path: str):
+    """Prints the change of every metric against a previous run."""
+
+    with open(baseline_path, encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+
+    print(f"\nCompared with {baseline.get('commit') or baseline_path}:")
+
+    for name, result in results["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+
+        if not before:
+            continue
+
+        changes = ", ".join(
+            f"{metric} {(result[metric] - before[metric]) / before[metric] * 100:+.1f}%"
+            for metric in ("messages_per_second", "p50_ms", "p99_ms", "peak_memory_mib")
+            if before.get(metric) and result.get(metric) is not None
+        )
+        print(f"{name:>24}: {changes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--messages", type=int, default=5000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight at once")
+    parser.add_argument("--guilds", type=int, default=1000, help="synthetic guilds")
+    parser.add_argument("--roles", type=int, default=50, help="roles per guild")
+    parser.add_argument("--categories", type=int, default=5, help="channel categories per guild")
+    parser.add_argument("--channels", type=int, default=10, help="text channels per category")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to wait for each reply")
+    parser.add_argument("--output", help="where to write the JSON results")
+    parser.add_argument("--compare", help="a previous JSON result to compare with")
+    args = parser.parse_args()
+
+    guild_ids = [create_guild(i, 0, 0, 0).id for i in range(args.guilds)]
+    scenario_results = asyncio.run(measure(build_scenarios(guild_ids), args))
+
+    results = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "parameters": vars(args),
+        "scenarios": scenario_results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if args.compare:
+        compare(results, args.compare)
+
+    failed = {
+        name: result for name, result in scenario_results.items() if result["errors"] or result["timeouts"]
+    }
+
+    if failed:
+        sys.exit(f"Failed requests in: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
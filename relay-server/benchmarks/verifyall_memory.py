@@ -0,0 +1,158 @@
+"""
+Memory benchmark for the verifyall member pipeline on a synthetic guild.
+
+Compares the peak traced memory of the legacy pipeline (chunking the whole guild into a
+list, slicing it into chunk copies and serializing chunk by chunk) with the lazy member
+batches read off the member cache and read from member list pages. The cached pipeline
+runs on a guild chunked before tracing starts, so it reports only what batching adds
+on top of the member cache.
+
+Run from the relay-server directory:
+    python -m benchmarks.verifyall_memory [member_count]
+"""
+import sys
+import asyncio
+import tracemalloc
+from dataclasses import dataclass, field
+from app.member_source import iter_member_batches
+
+
+PAGE_SIZE = 1000
+CHUNK_LIMIT = 100
+
+
+@dataclass(slots=True)
+class SyntheticMember:
+    """A stand-in for discord.Member holding the fields verifyall serializes."""
+
+    id: int
+    name: str
+    nick: str | None
+    avatar: str | None
+    role_ids: list[int] = field(default_factory=list)
+
+
+def create_member(index: int) -> SyntheticMember:
+    """Creates a deterministic synthetic member."""
+
+    return SyntheticMember(
+        id=100_000_000_000_000_000 + index,
+        name=f"member{index}",
+        nick=f"nick{index}" if index % 3 else None,
+        avatar=f"{index:032x}" if index % 2 else None,
+        role_ids=[200_000_000_000_000_000 + role for role in range(index % 8)],
+    )
+
+
+def serialize(member: SyntheticMember) -> dict:
+    """Mirrors the shape of MemberSerializable.model_dump() for a member."""
+
+    return {
+        "id": member.id,
+        "name": member.name,
+        "nick": member.nick,
+        "avatar": member.avatar,
+        "role_ids": [str(role_id) for role_id in member.role_ids],
+    }
+
+
+class SyntheticGuild:
+    """A stand-in for discord.Guild whose members are generated on demand."""
+
+    def __init__(self, member_count: int):
+        self.member_count = member_count
+        self.chunked = False
+        self._members: dict[int, SyntheticMember] = {}
+
+    @property
+    def members(self) -> list[SyntheticMember]:
+        return list(self._members.values())
+
+    async def chunk(self) -> list[SyntheticMember]:
+        self._members = {member.id: member for member in map(create_member, range(self.member_count))}
+        self.chunked = True
+        return self.members
+
+    async def fetch_members(self, limit=None, after=None):
+        for page_start in range(0, self.member_count, PAGE_SIZE):
+            page_end = min(page_start + PAGE_SIZE, self.member_count)
+            page = [create_member(i) for i in range(page_start, page_end)]
+            await asyncio.sleep(0)
+
+            for member in page:
+                yield member
+
+
+async def legacy_pipeline(guild: SyntheticGuild) -> int:
+    """The pipeline before streaming: materialize, slice, then serialize each chunk."""
+
+    members = await guild.chunk()
+    split_chunk = [members[i : i + CHUNK_LIMIT] for i in range(0, len(members), CHUNK_LIMIT)]
+    sent = 0
+
+    for member_chunk in split_chunk:
+        body = [serialize(member) for member in member_chunk]
+        sent += len(body)
+
+    return sent
+
+
+async def cached_pipeline(guild: SyntheticGuild) -> int:
+    """The streaming pipeline batching off the member cache."""
+
+    sent = 0
+
+    async for member_chunk in iter_member_batches(guild, CHUNK_LIMIT, "cache"):
+        body = [serialize(member) for member in member_chunk]
+        sent += len(body)
+
+    return sent
+
+
+async def streaming_pipeline(guild: SyntheticGuild) -> int:
+    """The streaming pipeline reading member list pages."""
+
+    sent = 0
+
+    async for member_chunk in iter_member_batches(guild, CHUNK_LIMIT, "pages"):
+        body = [serialize(member) for member in member_chunk]
+        sent += len(body)
+
+    return sent
+
+
+def measure(pipeline, member_count: int, *, chunked: bool = False) -> tuple[int, float]:
+    """Runs a pipeline on a fresh guild and returns the members sent and the peak MiB."""
+
+    guild = SyntheticGuild(member_count)
+
+    if chunked:
+        asyncio.run(guild.chunk())
+
+    tracemalloc.start()
+
+    try:
+        sent = asyncio.run(pipeline(guild))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return sent, peak / 1024 / 1024
+
+
+def main():
+    member_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+
+    pipelines = (
+        ("legacy", legacy_pipeline, False),
+        ("cached", cached_pipeline, True),
+        ("streaming", streaming_pipeline, False),
+    )
+
+    for name, pipeline, chunked in pipelines:
+        sent, peak = measure(pipeline, member_count, chunked=chunked)
+        print(f"{name:>10}: {sent} members sent, peak {peak:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import json
+import asyncio
+import unittest
+from unittest.mock import patch
+from pydantic import BaseModel
+from app.admission import PrioritySlots, admit, decode_request, request_deadline, request_expired
+from app.base import RelayEndpoint
+
+
+class RequestDeadlineTests(unittest.TestCase):
+    """Tests for the deadlines of relay request envelopes."""
+
+    def test_explicit_deadline(self):
+        envelope = {"nonce": "a", "data": {}, "sent_at": 100.0, "deadline": 105.0}
+
+        self.assertEqual(request_deadline(envelope), 105.0)
+        self.assertFalse(request_expired(envelope, now=104.9))
+        self.assertTrue(request_expired(envelope, now=105.0))
+
+    def test_deadline_from_max_age(self):
+        envelope = {"nonce": "a", "data": {}, "sent_at": 100.0}
+
+        with patch("app.admission.CONFIG.RELAY_REQUEST_MAX_AGE", 30):
+            self.assertEqual(request_deadline(envelope), 130.0)
+
+        with patch("app.admission.CONFIG.RELAY_REQUEST_MAX_AGE", 0):
+            self.assertIsNone(request_deadline(envelope))
+
+    def test_legacy_envelope_never_expires(self):
+        self.assertIsNone(request_deadline({"nonce": "a", "data": {}}))
+        self.assertFalse(request_expired({"nonce": "a", "data": {}}, now=1e12))
+
+
+class Payload(BaseModel):
+    guild_id: int
+
+
+class DecodeRequestTests(unittest.TestCase):
+    """Tests for decoding request frames on arrival."""
+
+    def test_expired_frame_payload_is_not_decoded(self):
+        endpoint = RelayEndpoint("TEST", Payload)
+        frame = json.dumps({"nonce": "a", "data": {"guild_id": "not a snowflake"}, "deadline": 1.0})
+
+        with patch.object(endpoint, "decode", wraps=endpoint.decode) as decode:
+            self.assertIsNone(decode_request(endpoint, frame))
+
+        decode.assert_not_called()
+
+    def test_live_frame_is_decoded(self):
+        endpoint = RelayEndpoint("TEST", Payload)
+        frame = json.dumps({"nonce": "a", "data": {"guild_id": "1"}})
+
+        self.assertEqual(decode_request(endpoint, frame)["data"], Payload(guild_id=1))
+
+    def test_malformed_frame_raises(self):
+        with self.assertRaises(ValueError):
+            decode_request(RelayEndpoint("TEST", Payload), b"{")
+
+
+class AdmitTests(unittest.IsolatedAsyncioTestCase):
+    """Tests for queueing requests for their endpoint's handlers."""
+
+    async def test_request_expiring_in_the_queue_is_not_admitted(self):
+        endpoint = RelayEndpoint("TEST", Payload, max_concurrency=1)
+        envelope = {"nonce": "a", "data": Payload(guild_id=1), "deadline": 100.0}
+
+        with patch("app.admission.time.time", return_value=99.0):
+            async with admit(endpoint, envelope) as admitted:
+                self.assertTrue(admitted)
+
+        with patch("app.admission.time.time", return_value=100.0):
+            async with admit(endpoint, envelope) as admitted:
+                self.assertFalse(admitted)
+
+        self.assertEqual(endpoint.queued, 0)
+
+    async def test_queued_count_is_restored_when_cancelled(self):
+        endpoint = RelayEndpoint("TEST", Payload, max_concurrency=1)
+        envelope = {"nonce": "a", "data": Payload(guild_id=1)}
+
+        async def wait():
+            async with admit(endpoint, envelope):
+                pass
+
+        async with endpoint.semaphore:
+            waiter = asyncio.create_task(wait())
+            await asyncio.sleep(0)
+            self.assertEqual(endpoint.queued, 1)
+
+            waiter.cancel()
+
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+
+        self.assertEqual(endpoint.queued, 0)
+
+
+class PrioritySlotsTests(unittest.IsolatedAsyncioTestCase):
+    """Tests for handing out handler slots by priority."""
+
+    async def test_free_slots_are_taken_immediately(self):
+        slots = PrioritySlots(2)
+
+        await slots.acquire(1)
+        await slots.acquire(1)
+
+        self.assertEqual(slots.available, 0)
+
+        slots.release()
+        self.assertEqual(slots.available, 1)
+
+    async def test_freed_slot_goes_to_most_urgent_waiter(self):
+        slots = PrioritySlots(1)
+        order = []
+
+        async def wait(name: str, priority: int):
+            async with slots.slot(priority):
+                order.append(name)
+
+        await slots.acquire(0)
+        waiters = [
+            asyncio.create_task(wait("low", 2)),
+            asyncio.create_task(wait("normal", 1)),
+            asyncio.create_task(wait("high", 0)),
+        ]
+        await asyncio.sleep(0)
+        slots.release()
+        await asyncio.gather(*waiters)
+
+        self.assertEqual(order, ["high", "normal", "low"])
+        self.assertEqual(slots.available, 1)
+
+    async def test_equal_priorities_are_served_in_arrival_order(self):
+        slots = PrioritySlots(1)
+        order = []
+
+        async def wait(name: str):
+            async with slots.slot(1):
+                order.append(name)
+
+        await slots.acquire(1)
+        waiters = [asyncio.create_task(wait(name)) for name in ("first", "second", "third")]
+        await asyncio.sleep(0)
+        slots.release()
+        await asyncio.gather(*waiters)
+
+        self.assertEqual(order, ["first", "second", "third"])
+
+    async def test_cancelled_waiter_is_skipped(self):
+        slots = PrioritySlots(1)
+
+        await slots.acquire(1)
+        cancelled = asyncio.create_task(slots.acquire(0))
+        waiter = asyncio.create_task(slots.acquire(1))
+        await asyncio.sleep(0)
+
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        slots.release()
+        await waiter
+
+        self.assertEqual(slots.available, 0)
+
+    async def test_slot_handed_over_to_cancelled_waiter_is_released(self):
+        slots = PrioritySlots(1)
+
+        await slots.acquire(1)
+        waiter = asyncio.create_task(slots.acquire(1))
+        await asyncio.sleep(0)
+
+        slots.release()
+        waiter.cancel()
+
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+
+        self.assertEqual(slots.available, 1)
+
+    async def test_slot_is_released_when_the_block_raises(self):
+        slots = PrioritySlots(1)
+
+        with self.assertRaises(RuntimeError):
+            async with slots.slot(1):
+                raise RuntimeError
+
+        self.assertEqual(slots.available, 1)
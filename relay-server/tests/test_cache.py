@@ -0,0 +1,119 @@
+import asyncio
+import unittest
+from app.cache import TTLCache
+
+
+class TTLCacheTests(unittest.IsolatedAsyncioTestCase):
+    """Tests for the TTL cache and its single-flight loads."""
+
+    async def test_concurrent_misses_load_once(self):
+        cache = TTLCache(max_size=10, ttl=60)
+        release = asyncio.Event()
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "value"
+
+        waiters = [asyncio.create_task(cache.get_or_load("key", loader)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+
+        self.assertEqual(await asyncio.gather(*waiters), ["value"] * 5)
+        self.assertEqual(calls, 1)
+        self.assertEqual(cache.get("key"), "value")
+
+    async def test_hit_skips_loader(self):
+        cache = TTLCache(max_size=10, ttl=60)
+        cache.set("key", "cached")
+
+        async def loader():
+            raise AssertionError("loader called on a hit")
+
+        self.assertEqual(await cache.get_or_load("key", loader), "cached")
+
+    async def test_none_is_returned_but_not_cached(self):
+        cache = TTLCache(max_size=10, ttl=60)
+
+        async def loader():
+            return None
+
+        self.assertIsNone(await cache.get_or_load("key", loader))
+        self.assertEqual(len(cache), 0)
+
+    async def test_failed_load_is_retried(self):
+        cache = TTLCache(max_size=10, ttl=60)
+
+        async def failing():
+            raise RuntimeError("upstream down")
+
+        async def loader():
+            return "value"
+
+        with self.assertRaises(RuntimeError):
+            await cache.get_or_load("key", failing)
+
+        self.assertEqual(await cache.get_or_load("key", loader), "value")
+
+    async def test_invalidated_load_does_not_repopulate(self):
+        cache = TTLCache(max_size=10, ttl=60)
+        release = asyncio.Event()
+
+        async def loader():
+            await release.wait()
+            return "stale"
+
+        waiter = asyncio.create_task(cache.get_or_load("key", loader))
+        await asyncio.sleep(0)
+        cache.invalidate("key")
+        release.set()
+
+        self.assertEqual(await waiter, "stale")
+        self.assertIsNone(cache.get("key"))
+
+    async def test_cancelled_waiter_does_not_cancel_load(self):
+        cache = TTLCache(max_size=10, ttl=60)
+        release = asyncio.Event()
+
+        async def loader():
+            await release.wait()
+            return "value"
+
+        cancelled = asyncio.create_task(cache.get_or_load("key", loader))
+        waiter = asyncio.create_task(cache.get_or_load("key", loader))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        release.set()
+
+        self.assertEqual(await waiter, "value")
+        self.assertEqual(cache.get("key"), "value")
+
+    def test_expired_entries_are_dropped(self):
+        cache = TTLCache(max_size=10, ttl=0)
+        cache.set("key", "value")
+
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(len(cache), 0)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TTLCache(max_size=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_invalidate_where(self):
+        cache = TTLCache(max_size=10, ttl=60)
+        cache.set((1, "premium"), True)
+        cache.set((2, "premium"), False)
+
+        cache.invalidate_where(lambda key: key[0] == 1)
+
+        self.assertIsNone(cache.get((1, "premium")))
+        self.assertFalse(cache.get((2, "premium")))
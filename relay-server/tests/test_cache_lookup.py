@@ -0,0 +1,74 @@
+import json
+import unittest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from app.endpoints.cache_lookup import lookup_snapshot, split_parts
+from app.events.cache_invalidation import on_member_remove
+from app.events.member_join import on_member_join
+from app.guild_snapshots import invalidate_snapshots
+
+
+class SplitPartsTests(unittest.TestCase):
+    """Tests for splitting serialized batch lookup entries into reply parts."""
+
+    def test_small_entries_fit_one_part(self):
+        self.assertEqual(split_parts(['"1":{}', '"2":{}'], 100), ['"1":{},"2":{}'])
+
+    def test_no_entries_give_one_empty_part(self):
+        self.assertEqual(split_parts([], 100), [""])
+
+    def test_parts_stay_within_the_limit(self):
+        entries = [f'"{guild_id}":{{"roles":[]}}' for guild_id in range(100)]
+        parts = split_parts(entries, 64)
+
+        self.assertGreater(len(parts), 1)
+        self.assertTrue(all(len(part) <= 64 for part in parts))
+
+    def test_entries_are_kept_whole_and_in_order(self):
+        entries = [f'"{guild_id}":{{"roles":[]}}' for guild_id in range(100)]
+        parts = split_parts(entries, 64)
+
+        merged = json.loads("{" + ",".join(parts) + "}")
+        self.assertEqual(list(merged), [str(guild_id) for guild_id in range(100)])
+
+        for part in parts:
+            json.loads("{" + part + "}")
+
+    def test_oversized_entry_gets_its_own_part(self):
+        large = '"2":"' + "x" * 200 + '"'
+
+        self.assertEqual(split_parts(['"1":1', large, '"3":3'], 64), ['"1":1', large, '"3":3'])
+
+
+class GuildSnapshotTests(unittest.IsolatedAsyncioTestCase):
+    """Tests for keeping the member count of guild snapshots current."""
+
+    def setUp(self):
+        self.guild = SimpleNamespace(
+            id=1, name="guild", icon=None, owner_id=2, splash=None, member_count=10,
+            created_at=datetime(2020, 1, 1, tzinfo=timezone.utc),
+        )
+        invalidate_snapshots(self.guild.id)
+
+    def total_members(self) -> int:
+        return json.loads(lookup_snapshot(self.guild, "guild"))["totalMembers"]
+
+    async def test_member_join_refreshes_the_member_count(self):
+        settings = SimpleNamespace(autoRoles=False, autoVerification=False, highTrafficServer=False)
+        self.assertEqual(self.total_members(), 10)
+
+        self.guild.member_count = 11
+
+        with patch("app.events.member_join.get_guild_settings", AsyncMock(return_value=settings)):
+            await on_member_join(SimpleNamespace(id=3, guild=self.guild))
+
+        self.assertEqual(self.total_members(), 11)
+
+    async def test_member_remove_refreshes_the_member_count(self):
+        self.assertEqual(self.total_members(), 10)
+
+        self.guild.member_count = 9
+        await on_member_remove(SimpleNamespace(id=3, guild=self.guild))
+
+        self.assertEqual(self.total_members(), 9)
@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+from app.chunk_dispatcher import AIMDRateLimiter
+
+
+def create_limiter(**kwargs) -> AIMDRateLimiter:
+    """Creates a limiter with round test settings, overridden by kwargs."""
+
+    settings = {
+        "initial_rate": 10,
+        "min_rate": 1,
+        "max_rate": 20,
+        "increase_step": 2,
+        "decrease_factor": 0.5,
+        "target_latency": 1,
+    }
+
+    return AIMDRateLimiter(**(settings | kwargs))
+
+
+class AIMDRateLimiterTests(unittest.IsolatedAsyncioTestCase):
+    """Tests for the AIMD rate feedback and pacing."""
+
+    def test_initial_rate_is_clamped(self):
+        self.assertEqual(create_limiter(initial_rate=100).rate, 20)
+        self.assertEqual(create_limiter(initial_rate=0.1).rate, 1)
+
+    def test_fast_success_increases_additively(self):
+        limiter = create_limiter()
+        limiter.on_success(0.5)
+
+        self.assertEqual(limiter.rate, 12)
+
+    def test_increase_is_capped_at_max_rate(self):
+        limiter = create_limiter(initial_rate=19)
+        limiter.on_success(0.5)
+
+        self.assertEqual(limiter.rate, 20)
+
+    def test_overload_decreases_multiplicatively(self):
+        limiter = create_limiter()
+        limiter.on_overload()
+
+        self.assertEqual(limiter.rate, 5)
+
+    def test_decrease_is_floored_at_min_rate(self):
+        limiter = create_limiter(initial_rate=1.5)
+        limiter.on_overload()
+
+        self.assertEqual(limiter.rate, 1)
+
+    def test_slow_success_counts_as_overload(self):
+        limiter = create_limiter()
+        limiter.on_success(2)
+
+        self.assertEqual(limiter.rate, 5)
+
+    async def test_acquire_spaces_slots_at_the_current_rate(self):
+        with patch("app.chunk_dispatcher.monotonic", return_value=100.0):
+            limiter = create_limiter()
+
+            with patch("app.chunk_dispatcher.asyncio.sleep", new_callable=AsyncMock) as sleep:
+                await limiter.acquire()
+                sleep.assert_not_called()
+
+                await limiter.acquire()
+                sleep.assert_awaited_once()
+                self.assertAlmostEqual(sleep.await_args.args[0], 0.1)
+
+                limiter.on_overload()
+                await limiter.acquire()
+                self.assertAlmostEqual(sleep.await_args.args[0], 0.2)
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from app.coalescing import RequestCoalescer, coalesce_key, readdress, serialize_body
+from app.endpoints.cache_lookup import Payload
+from app.endpoints.stats import InformationEndpoint
+from app.publisher import RawJSON
+from app.redis import RedisRelayRequest, handle_message
+from app.types import Response
+
+
+ENDPOINT = SimpleNamespace(path="CACHE_LOOKUP")
+
+
+def request(nonce: str) -> SimpleNamespace:
+    """Creates a request holding only what the coalescer reads."""
+
+    return SimpleNamespace(nonce=nonce, payload={"guildID": 1, "type": "roles"})
+
+
+def envelope(nonce: str) -> dict:
+    """Creates a REQUEST_STATS envelope without a deadline."""
+
+    return {"nonce": nonce, "data": {}}
+
+
+class CoalesceKeyTests(unittest.TestCase):
+    """Tests for the key identical requests share."""
+
+    def test_payload_models_ignore_field_order(self):
+        first = Payload.model_validate({"guildID": 1, "type": "roles"})
+        second = Payload.model_validate({"type": "roles", "guildID": 1})
+
+        self.assertEqual(coalesce_key(ENDPOINT, first), coalesce_key(ENDPOINT, second))
+
+    def test_dict_payloads_ignore_key_order(self):
+        self.assertEqual(
+            coalesce_key(ENDPOINT, {"a": 1, "b": 2}), coalesce_key(ENDPOINT, {"b": 2, "a": 1})
+        )
+
+    def test_different_payloads_or_endpoints_differ(self):
+        self.assertNotEqual(coalesce_key(ENDPOINT, {"a": 1}), coalesce_key(ENDPOINT, {"a": 2}))
+        self.assertNotEqual(
+            coalesce_key(ENDPOINT, {"a": 1}), coalesce_key(SimpleNamespace(path="REQUEST_STATS"), {"a": 1})
+        )
+
+
+class ReaddressTests(unittest.TestCase):
+    """Tests for sharing a serialized response with another request."""
+
+    def test_swaps_the_nonce(self):
+        body = serialize_body(Response(nonce="leader", success=True, result=[1, 2]))
+        readdressed = json.loads(readdress(body, "leader", "follower"))
+
+        self.assertEqual(readdressed["nonce"], "follower")
+        self.assertEqual(readdressed["result"], [1, 2])
+
+    def test_escapes_nonces(self):
+        body = serialize_body(Response(nonce="leader", success=True))
+
+        self.assertEqual(json.loads(readdress(body, "leader", 'a"b'))["nonce"], 'a"b')
+
+    def test_bodies_without_the_nonce_are_unchanged(self):
+        body = RawJSON('{"roles":[]}')
+
+        self.assertIs(readdress(body, "leader", "follower"), body)
+        self.assertIsNone(readdress(None, "leader", "follower"))
+
+    def test_serialize_body(self):
+        self.assertIsNone(serialize_body(None))
+        self.assertEqual(serialize_body({"a": 1}), '{"a": 1}')
+        self.assertIsInstance(serialize_body({"a": 1}), RawJSON)
+
+
+class RequestCoalescerTests(unittest.IsolatedAsyncioTestCase):
+    """Tests for waiting on an identical request in flight."""
+
+    async def test_followers_get_the_leader_body(self):
+        coalescer = RequestCoalescer()
+        key = coalesce_key(ENDPOINT, request("leader").payload)
+
+        with coalescer.lead(key) as flight:
+            follower = asyncio.create_task(coalescer.follow(key, coalescer.leader(key), request("follower")))
+            await asyncio.sleep(0)
+            flight.set_result(("leader", serialize_body(Response(nonce="leader", success=True))))
+
+        self.assertEqual(json.loads(await follower)["nonce"], "follower")
+        self.assertIsNone(coalescer.leader(key))
+
+    async def test_followers_get_an_error_when_the_leader_fails(self):
+        coalescer = RequestCoalescer()
+        key = coalesce_key(ENDPOINT, request("leader").payload)
+
+        with self.assertRaises(RuntimeError), coalescer.lead(key):
+            follower = asyncio.create_task(coalescer.follow(key, coalescer.leader(key), request("follower")))
+            await asyncio.sleep(0)
+            raise RuntimeError
+
+        response = json.loads(await follower)
+
+        self.assertEqual(response["nonce"], "follower")
+        self.assertFalse(response["success"])
+        self.assertTrue(response["error"])
+
+    async def test_followers_get_an_error_when_the_leader_is_cancelled(self):
+        coalescer = RequestCoalescer()
+        key = coalesce_key(ENDPOINT, request("leader").payload)
+        started = asyncio.Event()
+
+        async def lead():
+            with coalescer.lead(key):
+                started.set()
+                await asyncio.Event().wait()
+
+        leader = asyncio.create_task(lead())
+        await started.wait()
+        follower = asyncio.create_task(coalescer.follow(key, coalescer.leader(key), request("follower")))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        self.assertFalse(json.loads(await follower)["success"])
+        self.assertIsNone(coalescer.leader(key))
+
+    async def test_cancelled_follower_does_not_affect_the_leader(self):
+        coalescer = RequestCoalescer()
+        key = coalesce_key(ENDPOINT, request("leader").payload)
+
+        with coalescer.lead(key) as flight:
+            follower = asyncio.create_task(coalescer.follow(key, coalescer.leader(key), request("follower")))
+            await asyncio.sleep(0)
+            follower.cancel()
+
+            with self.assertRaises(asyncio.CancelledError):
+                await follower
+
+            self.assertFalse(flight.done())
+            flight.set_result(("leader", None))
+
+    def test_uncoalesced_requests_lead_nothing(self):
+        with RequestCoalescer().lead(None) as flight:
+            self.assertIsNone(flight)
+
+
+class StatsCoalescingTests(unittest.IsolatedAsyncioTestCase):
+    """Identical REQUEST_STATS requests are answered by one run of the real handler."""
+
+    async def test_identical_stats_requests_share_one_reply(self):
+        endpoint = InformationEndpoint()
+        replies = {}
+
+        async def respond(request, data, *, channel=None):  # pylint: disable=unused-argument
+            replies[request.nonce] = json.loads(data)
+
+        # Holding every endpoint slot keeps the first request queued while the second arrives.
+        for _ in range(endpoint.max_concurrency):
+            await endpoint.semaphore.acquire()
+
+        gateway = SimpleNamespace(guilds=[], users=[], lean_cache=False, started_at=0)
+
+        with (
+            patch("app.endpoints.stats.howblox", gateway),
+            patch("app.endpoints.stats.get_node_id", return_value=1),
+            patch.object(RedisRelayRequest, "respond", respond),
+            patch.object(endpoint, "handle", wraps=endpoint.handle) as handle,
+        ):
+            leader = asyncio.create_task(handle_message(endpoint, "REQUEST_STATS", envelope("a"), 0))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(handle_message(endpoint, "REQUEST_STATS", envelope("b"), 0))
+            await asyncio.sleep(0)
+
+            self.assertEqual(endpoint.queued, 1)
+
+            for _ in range(endpoint.max_concurrency):
+                endpoint.semaphore.release()
+
+            await asyncio.gather(leader, follower)
+
+        handle.assert_awaited_once()
+        self.assertEqual(replies["a"]["nonce"], "a")
+        self.assertEqual(replies["b"]["nonce"], "b")
+        self.assertEqual(replies["a"] | {"nonce": "b"}, replies["b"])
@@ -0,0 +1,79 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from pydantic import ValidationError
+from app.endpoints.verifyall import Payload
+from app.jobs import JOB_INDEX_KEY, VerifyAllJob, VerifyAllJobRecord, VerifyAllScheduler, job_key, lock_key
+
+
+def fake_redis() -> MagicMock:
+    """Creates a Redis stand-in whose lock is free and whose pipelines record their commands."""
+
+    pipeline = MagicMock()
+    pipeline.execute = AsyncMock(return_value=[])
+
+    client = MagicMock()
+    client.set = AsyncMock(return_value=True)
+    client.eval = AsyncMock(return_value=1)
+    client.pipeline.return_value.__aenter__.return_value = pipeline
+
+    return client
+
+
+class VerifyAllSubmitTests(unittest.IsolatedAsyncioTestCase):
+    """Tests for starting /verifyall jobs."""
+
+    def test_payload_rejects_non_positive_chunk_limits(self):
+        for chunk_limit in (0, -1):
+            with self.subTest(chunk_limit), self.assertRaises(ValidationError):
+                Payload(guild_id=1, channel_id=2, chunk_limit=chunk_limit)
+
+    async def test_invalid_chunk_limit_takes_no_lock(self):
+        client = fake_redis()
+        scheduler = VerifyAllScheduler(max_jobs=1, lock_ttl=30)
+
+        with patch("app.jobs.redis", client), self.assertRaises(ValueError):
+            await scheduler.submit(SimpleNamespace(id=1, member_count=10), "nonce", 2, 0)
+
+        client.set.assert_not_called()
+        client.pipeline.assert_not_called()
+        self.assertFalse(scheduler.jobs)
+
+    async def test_failed_start_releases_the_lock_and_deletes_the_record(self):
+        client = fake_redis()
+        pipeline = client.pipeline.return_value.__aenter__.return_value
+        scheduler = VerifyAllScheduler(max_jobs=1, lock_ttl=30)
+
+        with (
+            patch("app.jobs.redis", client),
+            patch("app.jobs.start_progress", AsyncMock(side_effect=ConnectionError)),
+            self.assertRaises(ConnectionError),
+        ):
+            await scheduler.submit(SimpleNamespace(id=1, member_count=10), "nonce", 2, 5)
+
+        pipeline.delete.assert_called_once_with(job_key("nonce"))
+        pipeline.srem.assert_called_once_with(JOB_INDEX_KEY, "nonce")
+        self.assertEqual(client.eval.await_args.args[2], lock_key(1))
+        self.assertFalse(scheduler.jobs)
+
+
+class VerifyAllCheckpointTests(unittest.IsolatedAsyncioTestCase):
+    """Tests for checkpointing /verifyall jobs."""
+
+    async def test_checkpoint_moves_past_given_up_chunks(self):
+        client = fake_redis()
+        pipeline = client.pipeline.return_value.__aenter__.return_value
+        record = VerifyAllJobRecord(nonce="nonce", guild_id=1, channel_id=2, chunk_limit=2)
+        job = VerifyAllJob(record, SimpleNamespace(id=1, member_count=4))
+        chunks = [tuple(SimpleNamespace(id=member_id) for member_id in ids) for ids in ((1, 2), (3, 4))]
+
+        with patch("app.jobs.redis", client):
+            await job.chunk_sent(2, chunks[1])
+            self.assertIsNone(record.cursor)
+
+            await job.chunk_failed(1, chunks[0])
+
+        self.assertEqual((record.chunks_done, record.chunks_failed, record.cursor), (2, 1, 4))
+        pipeline.hset.assert_called_with(job_key("nonce"), mapping={
+            "chunks_done": 2, "chunks_failed": 1, "cursor": 4,
+        })
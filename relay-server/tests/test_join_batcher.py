@@ -0,0 +1,36 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from app.join_batcher import MemberJoinBatcher
+
+
+def member(member_id: int, guild_id: int = 1) -> SimpleNamespace:
+    """Creates a member stand-in."""
+
+    return SimpleNamespace(id=member_id, guild=SimpleNamespace(id=guild_id))
+
+
+class MemberJoinBatcherTests(unittest.IsolatedAsyncioTestCase):
+    """Tests for forwarding member joins."""
+
+    async def test_joins_are_posted_immediately_without_the_bulk_route(self):
+        batcher = MemberJoinBatcher(window=60, max_batch_size=10, bulk=False)
+
+        with patch.object(batcher, "_send_member", AsyncMock()) as send_member:
+            batcher.add(new_member := member(1))
+            await asyncio.sleep(0)
+
+        send_member.assert_awaited_once_with(new_member)
+        self.assertFalse(batcher._pending) # pylint: disable=protected-access
+        self.assertFalse(batcher._flush_tasks) # pylint: disable=protected-access
+
+    async def test_joins_are_batched_with_the_bulk_route(self):
+        batcher = MemberJoinBatcher(window=60, max_batch_size=2, bulk=True)
+
+        with patch.object(batcher, "_send", AsyncMock()) as send:
+            batcher.add(first := member(1))
+            batcher.add(second := member(2))
+            await asyncio.sleep(0)
+
+        send.assert_awaited_once_with(1, [first, second])
@@ -0,0 +1,46 @@
+import unittest
+from unittest.mock import patch
+import msgpack
+from app import member_codec
+
+
+MEMBERS = [
+    {"id": "84117866944663552", "roles": ["1052311264406818816", "1052311264406818817"], "tags": ["007"]},
+    {"id": "84117866944663553", "roles": [], "tags": ["1"]},
+]
+
+
+class EncodeMemberBatchTests(unittest.TestCase):
+    """Tests for the columnar member batch encoding the bot API decodes."""
+
+    def test_members_are_encoded_in_columns(self):
+        with patch.object(member_codec, "_compressor", None):
+            body, headers = member_codec.encode_member_batch(1, MEMBERS, "nonce")
+
+        self.assertEqual(headers, {"Content-Type": member_codec.MEMBER_BATCH_CONTENT_TYPE})
+        self.assertEqual(msgpack.unpackb(body), {
+            "version": member_codec.MEMBER_BATCH_VERSION,
+            "guild_id": 1,
+            "nonce": "nonce",
+            "count": 2,
+            "columns": {
+                "id": ["84117866944663552", "84117866944663553"],
+                "roles": [[1052311264406818816, 1052311264406818817], []],
+                "tags": [["007"], ["1"]],
+            },
+            "snowflake_lists": ["roles"],
+        })
+
+    def test_batch_is_compressed_with_zstd(self):
+        body, headers = member_codec.encode_member_batch(1, MEMBERS)
+
+        self.assertEqual(headers["Content-Encoding"], "zstd")
+        decompressed = member_codec.zstandard.ZstdDecompressor().decompress(body)
+
+        self.assertEqual(msgpack.unpackb(decompressed)["count"], 2)
+
+    def test_empty_batch(self):
+        with patch.object(member_codec, "_compressor", None):
+            body, _ = member_codec.encode_member_batch(1, [])
+
+        self.assertEqual(msgpack.unpackb(body)["columns"], {})
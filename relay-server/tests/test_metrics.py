@@ -0,0 +1,99 @@
+import unittest
+from app.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+class ExpositionFormatTests(unittest.TestCase):
+    """Tests for rendering metrics in the Prometheus text exposition format."""
+
+    def test_help_and_type_lines_come_first(self):
+        counter = Counter("requests_total", "Requests handled.")
+        counter.inc()
+
+        self.assertEqual(
+            counter.render().splitlines(),
+            ["# HELP requests_total Requests handled.", "# TYPE requests_total counter", "requests_total 1"],
+        )
+
+    def test_help_text_is_escaped(self):
+        counter = Counter("requests_total", 'Path "a\\b"\nnext line')
+
+        self.assertEqual(counter.render().splitlines()[0], r'# HELP requests_total Path "a\\b"\nnext line')
+
+    def test_label_values_are_escaped(self):
+        counter = Counter("requests_total", "Requests handled.", ("endpoint",))
+        counter.inc('a\\b"c"\nd')
+
+        self.assertEqual(counter.render().splitlines()[-1], r'requests_total{endpoint="a\\b\"c\"\nd"} 1')
+
+    def test_sample_values(self):
+        gauge = Gauge("value", "A value.", ("name",))
+        gauge.set(3, "integer")
+        gauge.set(0.25, "fraction")
+        gauge.set(float("inf"), "infinite")
+
+        self.assertEqual(gauge.render().splitlines()[2:], [
+            'value{name="integer"} 3',
+            'value{name="fraction"} 0.25',
+            'value{name="infinite"} +Inf',
+        ])
+
+    def test_gauge_callback_is_read_at_render_time(self):
+        values = {"a": 1}
+        gauge = Gauge(
+            "value",
+            "A value.",
+            ("name",),
+            callback=lambda: [((name,), value) for name, value in values.items()],
+        )
+        gauge.set(100, "ignored")
+        values["a"] = 2
+
+        self.assertEqual(gauge.render().splitlines()[2:], ['value{name="a"} 2'])
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.5, 0.1))
+
+        for value in (0.05, 0.1, 0.3, 2):
+            histogram.observe(value, "a")
+
+        self.assertEqual(histogram.render().splitlines(), [
+            "# HELP latency_seconds Latency.",
+            "# TYPE latency_seconds histogram",
+            'latency_seconds_bucket{route="a",le="0.1"} 2',
+            'latency_seconds_bucket{route="a",le="0.5"} 3',
+            'latency_seconds_bucket{route="a",le="+Inf"} 4',
+            'latency_seconds_sum{route="a"} 2.45',
+            'latency_seconds_count{route="a"} 4',
+        ])
+
+    def test_histogram_without_labels(self):
+        histogram = Histogram("latency_seconds", "Latency.", buckets=(1,))
+        histogram.observe(5)
+
+        self.assertEqual(histogram.render().splitlines()[2:], [
+            'latency_seconds_bucket{le="1"} 0',
+            'latency_seconds_bucket{le="+Inf"} 1',
+            "latency_seconds_sum 5",
+            "latency_seconds_count 1",
+        ])
+
+
+class MetricsRegistryTests(unittest.TestCase):
+    """Tests for the metrics registry."""
+
+    def test_render_joins_metrics_and_ends_with_a_newline(self):
+        registry = MetricsRegistry()
+        registry.register(Counter("a_total", "A.")).inc()
+        registry.register(Gauge("b", "B.")).set(2)
+
+        self.assertEqual(registry.render(), (
+            "# HELP a_total A.\n# TYPE a_total counter\na_total 1\n"
+            "# HELP b B.\n# TYPE b gauge\nb 2\n"
+        ))
+
+    def test_duplicate_names_are_rejected(self):
+        registry = MetricsRegistry()
+        registry.register(Counter("a_total", "A."))
+
+        with self.assertRaises(ValueError):
+            registry.register(Gauge("a_total", "A."))
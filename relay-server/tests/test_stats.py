@@ -0,0 +1,41 @@
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from app.endpoints.stats import InformationEndpoint, StatsResponse
+from app.redis import RedisRelayRequest
+
+
+def fake_howblox(*, lean_cache: bool = False) -> SimpleNamespace:
+    """Creates a stand-in for the gateway client holding two guilds and three users."""
+
+    return SimpleNamespace(
+        guilds=[object(), object()],
+        users=[object(), object(), object()],
+        lean_cache=lean_cache,
+        started_at=time.time() - 60,
+    )
+
+
+class InformationEndpointTests(unittest.IsolatedAsyncioTestCase):
+    """Tests for the REQUEST_STATS handler."""
+
+    async def test_reply_is_addressed_to_the_request(self):
+        with (
+            patch("app.endpoints.stats.howblox", fake_howblox()),
+            patch("app.endpoints.stats.get_node_id", return_value=3),
+        ):
+            response = await InformationEndpoint().handle(RedisRelayRequest(time.time_ns(), "nonce", {}))
+
+        self.assertIsInstance(response, StatsResponse)
+        self.assertEqual(response.nonce, "nonce")
+        self.assertEqual((response.node_id, response.guild_count, response.user_count), (3, 2, 3))
+        self.assertGreaterEqual(response.uptime.total_seconds(), 60)
+        self.assertTrue(response.model_dump_json().startswith('{"nonce":"nonce"'))
+
+    async def test_user_count_is_none_in_lean_mode(self):
+        with patch("app.endpoints.stats.howblox", fake_howblox(lean_cache=True)):
+            response = await InformationEndpoint().handle(RedisRelayRequest(time.time_ns(), "nonce", {}))
+
+        self.assertIsNone(response.user_count)
+        self.assertEqual(response.guild_count, 2)